@@ -0,0 +1,354 @@
+#! /usr/bin/env python3
+
+import sys
+import os
+import argparse
+import csv
+import json
+import time
+import random
+import re
+import subprocess
+import tempfile
+
+from safegraph_mapper import mapping
+from safegraph_mapper.files import open_input_file
+from safegraph_mapper.readers import (
+    get_column_indexes,
+    get_large_column_indexes,
+    line_reader,
+    mmap_reader,
+    projected_csv_reader,
+    projected_reader,
+)
+from safegraph_mapper.serializers import get_serializer
+
+mapper_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "safegraph-mapper.py")
+
+placekey_chars = "23456789bcdfghjkmnpqrstvwxyz"
+
+
+# =========================
+class place_generator:
+
+    # ----------------------------------------
+    def __init__(self, seed=None):
+
+        self.random = random.Random(seed)
+        self.column_profiles = load_column_profiles()
+        self.columns = list(self.column_profiles)
+        self.placekeys = []
+
+    # ----------------------------------------
+    def generate_row(self):
+        row = {}
+        for column_name in self.columns:
+            profile = self.column_profiles[column_name]
+            if column_name == "PLACEKEY":
+                row[column_name] = self.new_placekey()
+                self.placekeys.append(row[column_name])
+            elif self.random.random() * 100 >= profile["populated"]:
+                row[column_name] = ""
+            elif column_name == "PARENT_PLACEKEY":
+                row[column_name] = self.parent_placekey()
+            elif column_name == "POLYGON_WKT":
+                row[column_name] = self.polygon(row)
+            elif column_name == "OPEN_HOURS":
+                row[column_name] = self.open_hours()
+            else:
+                row[column_name] = self.profile_value(profile)
+        return [row[column_name] for column_name in self.columns]
+
+    # ----------------------------------------
+    def profile_value(self, profile):
+
+        # --repeat a profiled example as often as the unique percentage allows,
+        # --otherwise vary the digits of one so the value is (almost always) new
+        examples = profile["examples"]
+        if not examples:
+            return "%s" % self.random.randrange(1000000)
+        if self.random.random() * 100 >= profile["unique"]:
+            return self.random.choices(examples, weights=profile["weights"])[0]
+        value = self.random.choice(examples)
+        digit_positions = [i for i, x in enumerate(value) if x.isdigit()]
+        if not digit_positions:
+            return "%s %s" % (value, self.random.randrange(10000))
+        value = list(value)
+        for i in digit_positions[len(digit_positions) // 2 :]:
+            value[i] = self.random.choice("0123456789")
+        return "".join(value)
+
+    # ----------------------------------------
+    def new_placekey(self):
+        return "%s-%s@%s-%s-%s" % tuple("".join(self.random.choice(placekey_chars) for _ in range(3)) for _ in range(5))
+
+    # ----------------------------------------
+    def parent_placekey(self):
+        # --most parents are a few malls and airports with lots of children,
+        # --a small share point at places that are not in the file at all
+        selector = self.random.random()
+        if selector < 0.05 or not self.placekeys:
+            return self.new_placekey()
+        if selector < 0.8:
+            return self.random.choice(self.placekeys[:50])
+        return self.random.choice(self.placekeys)
+
+    # ----------------------------------------
+    def polygon(self, row):
+        latitude = float(row["LATITUDE"] or 47.6)
+        longitude = float(row["LONGITUDE"] or -122.3)
+        points = [
+            "%s %s"
+            % (
+                longitude + self.random.uniform(-0.001, 0.001),
+                latitude + self.random.uniform(-0.001, 0.001),
+            )
+            for _ in range(self.random.randrange(4, 120))
+        ]
+        points.append(points[0])
+        return "POLYGON ((%s))" % ", ".join(points)
+
+    # ----------------------------------------
+    def open_hours(self):
+        opens = "%s:00" % self.random.randrange(6, 11)
+        closes = "%s:00" % self.random.randrange(16, 23)
+        return json.dumps({day: [[opens, closes]] for day in ["Mon", "Tue", "Wed", "Thu", "Fri"]})
+
+
+# ----------------------------------------
+def load_column_profiles():
+
+    # --the profile comments above each mapping in mapper.map() look like ...
+    # --    # columnName: LOCATION_NAME
+    # --    # 100.0 populated, 74.99 unique
+    # --    #      USPS Collection Point (2916)
+    column_profiles = {}
+    profile = None
+    with open(mapping.__file__, "r", encoding="utf-8") as file_handle:
+        for line in file_handle:
+            line = line.strip()
+            if line.startswith("# columnName:"):
+                profile = {
+                    "populated": 0.0,
+                    "unique": 0.0,
+                    "examples": [],
+                    "weights": [],
+                }
+                column_profiles[line.split(":", 1)[1].strip()] = profile
+                continue
+            if not profile or not line.startswith("#"):
+                profile = None
+                continue
+            populated_match = re.match(r"# ([\d.]+) populated, ([\d.]+) unique", line)
+            example_match = re.match(r"#\s{2,}(.*) \((\d+)\)$", line)
+            if populated_match:
+                profile["populated"] = float(populated_match.group(1))
+                profile["unique"] = float(populated_match.group(2))
+            elif example_match:
+                profile["examples"].append(example_match.group(1).replace("\\n", "\n"))
+                profile["weights"].append(int(example_match.group(2)))
+    return column_profiles
+
+
+# ----------------------------------------
+def generate_file(file_name, row_count, seed=None):
+    generator = place_generator(seed)
+    with open(file_name, "w", newline="", encoding="utf-8") as file_handle:
+        csv_writer = csv.writer(file_handle)
+        csv_writer.writerow(generator.columns)
+        for _ in range(row_count):
+            csv_writer.writerow(generator.generate_row())
+
+
+# ----------------------------------------
+def time_stages(input_file, reader_type, serializer_name):
+
+    # --runs the same steps as the mapper, timing each one separately
+    stage_times = {
+        "parse": 0.0,
+        "clean": 0.0,
+        "map": 0.0,
+        "stats": 0.0,
+        "serialize": 0.0,
+    }
+    map_mapper = mapping.mapper("off")
+    stat_mapper = mapping.mapper("sampled")
+    serialize = get_serializer(serializer_name)
+    mapped_columns = map_mapper.mapped_columns
+    timer = time.perf_counter
+
+    with open_input_file(input_file) as input_file_handle:
+        input_reader = line_reader(input_file_handle)
+        header = next(csv.reader(input_reader))
+        column_indexes = get_column_indexes(header, mapped_columns)
+        if reader_type == "mmap":
+            input_rows = mmap_reader(
+                input_file_handle,
+                column_indexes,
+                input_reader.offset,
+                skip_column_indexes=get_large_column_indexes(header, column_indexes),
+            )
+        elif reader_type == "projected":
+            input_rows = projected_reader(
+                input_reader,
+                column_indexes,
+                skip_column_indexes=get_large_column_indexes(header, column_indexes),
+            )
+        else:
+            input_rows = projected_csv_reader(input_reader, len(header), column_indexes)
+
+        row_count = 0
+        start_time = timer()
+        for input_row in input_rows:
+            parsed_time = timer()
+            raw_data = map_mapper.clean_row(input_row)
+            cleaned_time = timer()
+            json_data = map_mapper.map(raw_data, cleaned=True)
+            mapped_time = timer()
+            stat_mapper.capture_mapped_stats(json_data)
+            stats_time = timer()
+            serialize(json_data)
+            serialized_time = timer()
+
+            stage_times["parse"] += parsed_time - start_time
+            stage_times["clean"] += cleaned_time - parsed_time
+            stage_times["map"] += mapped_time - cleaned_time
+            stage_times["stats"] += stats_time - mapped_time
+            stage_times["serialize"] += serialized_time - stats_time
+            row_count += 1
+            start_time = timer()
+
+    return row_count, stage_times
+
+
+# ----------------------------------------
+def time_mapper_run(input_file, output_file, worker_count, extra_args):
+
+    # --wait4 gives the resource usage of this one run, ru_maxrss is KB on linux
+    command = [
+        sys.executable,
+        mapper_file,
+        "-i",
+        input_file,
+        "-o",
+        output_file,
+        "-w",
+        str(worker_count),
+    ] + extra_args
+    start_time = time.time()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _, exit_status, resource_usage = os.wait4(process.pid, 0)
+    elapsed_seconds = time.time() - start_time
+    process.returncode = os.waitstatus_to_exitcode(exit_status)
+    if process.returncode != 0:
+        raise RuntimeError("mapper failed running %s" % " ".join(command))
+    peak_rss_mb = resource_usage.ru_maxrss / (1048576 if sys.platform == "darwin" else 1024)
+    return elapsed_seconds, peak_rss_mb
+
+
+# ----------------------------------------
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        dest="sizes",
+        default="10000,100000",
+        help="comma separated row counts of the synthetic files to benchmark, defaults to 10000,100000",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        default="1",
+        help="comma separated worker counts to run the mapper with, defaults to 1",
+    )
+    parser.add_argument(
+        "-t",
+        "--temp_dir",
+        dest="temp_dir",
+        help="directory for the synthetic input and mapped output files",
+    )
+    parser.add_argument(
+        "--seed",
+        dest="seed",
+        type=int,
+        default=1,
+        help="random seed for the synthetic data, defaults to 1",
+    )
+    parser.add_argument(
+        "--reader",
+        dest="reader",
+        choices=["csv", "projected", "mmap"],
+        default="csv",
+        help="input reader to benchmark",
+    )
+    parser.add_argument(
+        "--serializer",
+        dest="serializer",
+        choices=["auto", "orjson", "json"],
+        default="auto",
+        help="json serializer to benchmark",
+    )
+    parser.add_argument(
+        "-r",
+        "--report_file",
+        dest="report_file",
+        help="optional name of a json file for the results",
+    )
+    args = parser.parse_args()
+
+    try:
+        row_counts = [int(x) for x in args.sizes.split(",")]
+        worker_counts = [int(x) for x in args.workers.split(",")]
+    except ValueError:
+        print("\nSizes and workers must be comma separated numbers\n")
+        sys.exit(1)
+
+    mapper_args = ["--reader", args.reader, "--serializer", args.serializer]
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.temp_dir) as temp_dir:
+        for row_count in row_counts:
+            input_file = os.path.join(temp_dir, "places-%s.csv" % row_count)
+            output_file = os.path.join(temp_dir, "places-%s.json" % row_count)
+            print("generating %s rows ..." % row_count)
+            generate_file(input_file, row_count, args.seed)
+            file_mb = os.path.getsize(input_file) / 1048576
+
+            stage_row_count, stage_times = time_stages(input_file, args.reader, args.serializer)
+            total_time = sum(stage_times.values())
+            print(
+                "  stages: %s"
+                % ", ".join("%s %.1f%%" % (stage, stage_times[stage] * 100 / total_time) for stage in stage_times)
+            )
+
+            for worker_count in worker_counts:
+                elapsed_seconds, peak_rss_mb = time_mapper_run(input_file, output_file, worker_count, mapper_args)
+                result = {
+                    "rows": row_count,
+                    "file_mb": round(file_mb, 1),
+                    "workers": worker_count,
+                    "seconds": round(elapsed_seconds, 2),
+                    "rows_per_sec": round(row_count / elapsed_seconds),
+                    "mb_per_sec": round(file_mb / elapsed_seconds, 2),
+                    "peak_rss_mb": round(peak_rss_mb, 1),
+                    "stage_seconds": {stage: round(stage_times[stage], 3) for stage in stage_times},
+                }
+                results.append(result)
+                print(
+                    "  %s workers: %s rows/sec, %s MB/sec, %s MB peak rss"
+                    % (
+                        worker_count,
+                        result["rows_per_sec"],
+                        result["mb_per_sec"],
+                        result["peak_rss_mb"],
+                    )
+                )
+
+    if args.report_file:
+        with open(args.report_file, "w") as outfile:
+            json.dump(results, outfile, indent=4)
+        print("\nBenchmark results written to %s\n" % args.report_file)
+
+    sys.exit(0)
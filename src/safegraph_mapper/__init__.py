@@ -0,0 +1,15 @@
+#! /usr/bin/env python3
+
+# --the mapper as a library for spark or dask jobs and long running services ...
+# --
+# --    import safegraph_mapper
+# --
+# --    json_lines = safegraph_mapper.map_batch(rows)
+# --    for json_line in safegraph_mapper.map_stream(csv.DictReader(infile)):
+# --        ...
+# --
+# --the command line in safegraph-mapper.py runs cli.main()
+
+from .mapping import map_batch, map_stream, mapper
+
+__all__ = ["mapper", "map_batch", "map_stream"]
@@ -0,0 +1,377 @@
+# --the command line, safegraph-mapper.py runs main()
+
+import sys
+import os
+import argparse
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .files import get_columnar_ext, get_compression_ext, get_input_files, get_suffixed_file_name, import_pyarrow
+from .runner import run
+
+
+# ----------------------------------------
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-i",
+        "--input_file",
+        dest="input_file",
+        help="the name of the input file, a directory of input files or a quoted glob pattern like 'places/*.csv.gz'",
+    )
+    parser.add_argument("-o", "--output_file", dest="output_file", help="the name of the output file")
+    parser.add_argument(
+        "-l",
+        "--log_file",
+        dest="log_file",
+        help="optional name of the statistics log file",
+    )
+    parser.add_argument(
+        "--stats_mode",
+        dest="stats_mode",
+        choices=["off", "counts", "sampled"],
+        default="sampled",
+        help="statistics to collect for the log file, sampled adds example values to the counts",
+    )
+    parser.add_argument(
+        "--serializer",
+        dest="serializer",
+        choices=["auto", "orjson", "json"],
+        default="auto",
+        help="json serializer for the output, auto uses orjson when it is installed",
+    )
+    parser.add_argument(
+        "--check_serializer",
+        dest="check_serializer",
+        action="store_true",
+        default=False,
+        help="verify every record serializes the same with orjson and the json module",
+    )
+    parser.add_argument(
+        "--checkpoint_interval",
+        dest="checkpoint_interval",
+        type=int,
+        default=0,
+        help="write a checkpoint every this many rows so an interrupted run can be resumed",
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        action="store_true",
+        default=False,
+        help="resume from the last checkpoint of a previous run with the same arguments",
+    )
+    parser.add_argument(
+        "--delta_index",
+        dest="delta_index",
+        help="only output new and changed records compared to the run that wrote this index, the index is then updated",
+    )
+    parser.add_argument(
+        "--delete_file",
+        dest="delete_file",
+        help="where to write deletes for records no longer in the file, defaults to the output file name plus -deletes",
+    )
+    parser.add_argument(
+        "--temp_dir",
+        dest="temp_dir",
+        help="directory for temporary files, defaults to the system temp directory",
+    )
+    parser.add_argument(
+        "--reader",
+        dest="reader",
+        choices=["csv", "projected", "mmap"],
+        default="csv",
+        help="projected only parses the columns that get mapped, skipping large ones like POLYGON_WKT, mmap does the same on the memory mapped file",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        type=int,
+        default=1,
+        help="number of processes to map with, defaults to 1",
+    )
+    parser.add_argument(
+        "--worker_output",
+        dest="worker_output",
+        choices=["ordered", "sharded"],
+        default="ordered",
+        help="with multiple workers, merge their output in input order or leave one file per worker",
+    )
+    parser.add_argument(
+        "--batch_size",
+        dest="batch_size",
+        type=int,
+        default=65536,
+        help="rows per record batch when mapping parquet or arrow input, defaults to 65536",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        action="store_true",
+        default=False,
+        help="time the mapping stages and write a profile report next to the log file",
+    )
+    parser.add_argument(
+        "--profile_interval",
+        dest="profile_interval",
+        type=int,
+        default=100,
+        help="with --profile, time the stages of 1 row in this many, defaults to 100",
+    )
+    parser.add_argument(
+        "--status_file",
+        dest="status_file",
+        help="rewrite this json file with the rows and bytes per second, offsets, eta and worker utilization as the run goes",
+    )
+    parser.add_argument(
+        "--metrics_port",
+        dest="metrics_port",
+        type=int,
+        default=0,
+        help="serve the same progress as prometheus metrics on this localhost port",
+    )
+    parser.add_argument(
+        "--status_interval",
+        dest="status_interval",
+        type=int,
+        default=5,
+        help="seconds between status file and metrics updates, defaults to 5",
+    )
+    parser.add_argument(
+        "--load_senzing",
+        dest="load_senzing",
+        action="store_true",
+        default=False,
+        help="add the mapped records straight into senzing instead of writing an output file",
+    )
+    parser.add_argument(
+        "--senzing_settings",
+        dest="senzing_settings",
+        default=os.environ.get("SENZING_ENGINE_CONFIGURATION_JSON"),
+        help="senzing engine settings json, defaults to the SENZING_ENGINE_CONFIGURATION_JSON environment variable",
+    )
+    parser.add_argument(
+        "--load_threads",
+        dest="load_threads",
+        type=int,
+        default=4,
+        help="threads adding records into senzing per worker, defaults to 4",
+    )
+    parser.add_argument(
+        "--load_batch_size",
+        dest="load_batch_size",
+        type=int,
+        default=100,
+        help="records queued for the load threads at a time, defaults to 100",
+    )
+    parser.add_argument(
+        "--load_queue_size",
+        dest="load_queue_size",
+        type=int,
+        default=0,
+        help="batches that can wait on the load threads before mapping pauses, defaults to 2 per thread",
+    )
+    parser.add_argument(
+        "--pipeline",
+        dest="pipeline",
+        action="store_true",
+        default=False,
+        help="read and write on their own threads so disk and compression work overlaps with mapping",
+    )
+    parser.add_argument(
+        "--queue_size",
+        dest="queue_size",
+        type=int,
+        default=8,
+        help="with --pipeline, chunks of input and batches of output that can be queued, defaults to 8",
+    )
+    parser.add_argument(
+        "--parent_check",
+        dest="parent_check",
+        action="store_true",
+        default=False,
+        help="index every PLACEKEY in a first pass and report parent pointers to places not in the file and how many children each parent has",
+    )
+    parser.add_argument(
+        "--drop_absent_parents",
+        dest="drop_absent_parents",
+        action="store_true",
+        default=False,
+        help="run the --parent_check pass and leave out parent pointers to places not in the file",
+    )
+    parser.add_argument(
+        "--max_field_size",
+        dest="max_field_size",
+        type=int,
+        default=0,
+        help="largest mapped field in bytes before stopping with an error, larger fields that are not mapped (like POLYGON_WKT) are skipped, defaults to no limit",
+    )
+    parser.add_argument(
+        "--max_example_size",
+        dest="max_example_size",
+        type=int,
+        default=0,
+        help="cut statistics examples longer than this many characters, with a hash of the whole value, defaults to no limit",
+    )
+    parser.add_argument(
+        "--memory_limit",
+        dest="memory_limit",
+        type=int,
+        default=0,
+        help="hard limit in MB on the memory each mapper process can allocate, it stops with an error instead of being killed",
+    )
+    parser.add_argument(
+        "--shard_count",
+        dest="shard_count",
+        type=int,
+        default=0,
+        help="split the output into this many files by a hash of the RECORD_ID, each with a manifest",
+    )
+    parser.add_argument(
+        "--shard_size",
+        dest="shard_size",
+        type=int,
+        default=0,
+        help="instead of --shard_count, use one output shard for about this many MB of input",
+    )
+    parser.add_argument(
+        "--duplicates",
+        dest="duplicates",
+        choices=["report", "first", "rename"],
+        help="check for records with the same RECORD_ID in a first pass: report them, keep only the first or rename the later ones so senzing resolves them instead of replacing the first",
+    )
+    parser.add_argument(
+        "--sort_output",
+        dest="sort_output",
+        choices=["placekey", "geohash"],
+        help="sort the output by the cell in the PLACEKEY or by the geohash of the coordinates, shards then get consecutive ranges",
+    )
+    parser.add_argument(
+        "--geohash_precision",
+        dest="geohash_precision",
+        type=int,
+        default=5,
+        help="characters of geohash to sort on, defaults to 5 (about 5 km)",
+    )
+    parser.add_argument(
+        "--sort_memory",
+        dest="sort_memory",
+        type=int,
+        default=256,
+        help="MB of records to sort in memory at a time, the rest are merged from --temp_dir, defaults to 256",
+    )
+    parser.add_argument(
+        "--bloom_size",
+        dest="bloom_size",
+        type=int,
+        default=64,
+        help="MB for the --duplicates bloom filter, about 1 MB per 800,000 records keeps the false positives near 1%%, defaults to 64",
+    )
+    return parser
+
+
+# ----------------------------------------
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+
+    args.input_files = get_input_files(args.input_file) if args.input_file else []
+    if not args.input_files:
+        print("\nPlease supply a valid input file name on the command line\n")
+        sys.exit(1)
+    if len(args.input_files) > 1:
+        print("%s input files found for %s" % (len(args.input_files), args.input_file))
+    args.input_file = args.input_files[0]
+    args.position_base = 0
+    if args.load_senzing:
+        if args.output_file:
+            print("\nRecords are either written to an output file or loaded into senzing\n")
+            sys.exit(1)
+        if not args.senzing_settings:
+            print("\nPlease supply --senzing_settings or set SENZING_ENGINE_CONFIGURATION_JSON\n")
+            sys.exit(1)
+        if args.checkpoint_interval or args.resume:
+            print("\nCheckpoints and resume require an output file\n")
+            sys.exit(1)
+        if args.load_threads < 1 or args.load_batch_size < 1:
+            print("\nThe load threads and batch size must be at least 1\n")
+            sys.exit(1)
+        if args.delta_index and not args.delete_file:
+            print("\nPlease supply a --delete_file for the deletes when loading a delta\n")
+            sys.exit(1)
+    elif not args.output_file:
+        print("\nPlease supply a valid output file name on the command line\n")
+        sys.exit(1)
+    if args.workers < 1:
+        print("\nThe number of workers must be at least 1\n")
+        sys.exit(1)
+    if args.reader == "mmap" and len(args.input_files) == 1:
+        if get_compression_ext(args.input_file):
+            print("\nCompressed input files cannot be memory mapped, using --reader projected\n")
+            args.reader = "projected"
+    if args.reader == "mmap" and args.pipeline:
+        print("\nThe mmap reader has nothing to read ahead, use --pipeline with the other readers\n")
+        sys.exit(1)
+    if args.profile_interval < 1:
+        print("\nThe profile interval must be at least 1\n")
+        sys.exit(1)
+    if args.queue_size < 1:
+        print("\nThe queue size must be at least 1\n")
+        sys.exit(1)
+    if args.status_interval < 1 or not 0 <= args.metrics_port <= 65535:
+        print("\nThe status interval must be at least 1 and the metrics port 1 to 65535\n")
+        sys.exit(1)
+    if args.bloom_size < 1:
+        print("\nThe bloom filter size must be at least 1 MB\n")
+        sys.exit(1)
+    if args.sort_output:
+        if not 1 <= args.geohash_precision <= 12 or args.sort_memory < 1:
+            print("\nThe geohash precision must be 1 to 12 and the sort memory at least 1 MB\n")
+            sys.exit(1)
+        if args.load_senzing or args.worker_output == "sharded":
+            print("\nSorted output cannot be combined with --load_senzing or --worker_output sharded\n")
+            sys.exit(1)
+    if args.shard_count < 0 or args.shard_size < 0:
+        print("\nThe shard count and shard size cannot be negative\n")
+        sys.exit(1)
+    if args.shard_size:
+        if args.shard_count:
+            print("\nPlease supply either a --shard_count or a --shard_size\n")
+            sys.exit(1)
+        args.shard_count = -(-sum(os.path.getsize(x) for x in args.input_files) // (args.shard_size * 1048576))
+    if args.shard_count and not args.sort_output and (args.load_senzing or args.checkpoint_interval or args.resume):
+        print("\nSharded output cannot be combined with --load_senzing, checkpoints or resume\n")
+        sys.exit(1)
+    if args.max_field_size < 0 or args.max_example_size < 0 or args.memory_limit < 0:
+        print("\nThe field size, example size and memory limit cannot be negative\n")
+        sys.exit(1)
+    if args.memory_limit and not hasattr(resource, "RLIMIT_DATA"):
+        print("\nA --memory_limit is not supported on this platform\n")
+        sys.exit(1)
+    if (args.checkpoint_interval or args.resume) and not args.sort_output and get_compression_ext(args.output_file):
+        print("\nCheckpoints and resume require an uncompressed output file\n")
+        sys.exit(1)
+    if args.delta_index and (args.checkpoint_interval or args.resume):
+        print("\nDelta mode cannot be combined with checkpoints or resume\n")
+        sys.exit(1)
+    columnar_input = any(get_columnar_ext(x) for x in args.input_files)
+    if columnar_input and not import_pyarrow():
+        print("\nThe pyarrow package is required to read parquet and arrow files\n")
+        sys.exit(1)
+    if columnar_input and (args.delta_index or args.checkpoint_interval or args.resume or args.check_serializer):
+        print(
+            "\nParquet and arrow input cannot be combined with delta mode, checkpoints, resume or --check_serializer\n"
+        )
+        sys.exit(1)
+    if columnar_input and args.memory_limit:
+        # --arrow reserves its memory pools and thread stacks up front
+        print("\nParquet and arrow input cannot be mapped with a --memory_limit\n")
+        sys.exit(1)
+    if args.delta_index and not args.delete_file:
+        args.delete_file = get_suffixed_file_name(args.output_file, "-deletes")
+
+    run(args)
+    return 0
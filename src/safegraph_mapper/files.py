@@ -0,0 +1,212 @@
+# --opening input and output files, compressed or not, finding the input files and reading parquet
+# --and arrow files
+
+import os
+import io
+import gzip
+import bz2
+import lzma
+import glob
+import importlib
+import functools
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+io_buffer_size = 8388608
+compression_exts = [".gz", ".bz2", ".xz", ".zst"]
+columnar_exts = [".parquet", ".arrow", ".feather"]
+
+
+# ----------------------------------------
+def import_optional(module_name):
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        return None
+
+
+# ----------------------------------------
+@functools.cache
+def import_pyarrow():
+    # --pyarrow is slow to import so it is only imported for the first parquet or arrow
+    # --file or record batch, returns None if it is not installed
+    pyarrow = import_optional("pyarrow")
+    if pyarrow:
+        for module_name in ["pyarrow.compute", "pyarrow.ipc", "pyarrow.parquet"]:
+            importlib.import_module(module_name)
+    return pyarrow
+
+
+# ----------------------------------------
+def get_input_files(input_spec):
+    # --a file, a directory or a glob pattern, in name order so the output is too
+    if os.path.isdir(input_spec):
+        return sorted(
+            file_name
+            for file_name in glob.glob(os.path.join(input_spec, "*"))
+            if os.path.isfile(file_name) and is_input_file_name(file_name)
+        )
+    if os.path.isfile(input_spec):
+        return [input_spec]
+    return sorted(file_name for file_name in glob.glob(input_spec) if os.path.isfile(file_name))
+
+
+# ----------------------------------------
+def is_input_file_name(file_name):
+    compression_ext = get_compression_ext(file_name)
+    file_ext = os.path.splitext(file_name[: -len(compression_ext) or None])[1].lower()
+    return file_ext == ".csv" or (not compression_ext and file_ext in columnar_exts)
+
+
+# ----------------------------------------
+def get_columnar_ext(file_name):
+    file_ext = os.path.splitext(file_name)[1].lower()
+    return file_ext if file_ext in columnar_exts else ""
+
+
+# ----------------------------------------
+def read_columnar_header(file_name):
+    pyarrow = import_pyarrow()
+    if get_columnar_ext(file_name) == ".parquet":
+        return pyarrow.parquet.read_schema(file_name).names
+    with pyarrow.ipc.open_file(file_name) as ipc_reader:
+        return ipc_reader.schema.names
+
+
+# ----------------------------------------
+def get_columnar_row_counts(file_name):
+    # --row counts of the parquet row groups or arrow record batches, the units a
+    # --columnar file is split on
+    pyarrow = import_pyarrow()
+    if get_columnar_ext(file_name) == ".parquet":
+        metadata = pyarrow.parquet.read_metadata(file_name)
+        return [metadata.row_group(row_group).num_rows for row_group in range(metadata.num_row_groups)]
+    with pyarrow.ipc.open_file(file_name) as ipc_reader:
+        return [ipc_reader.get_batch(batch_num).num_rows for batch_num in range(ipc_reader.num_record_batches)]
+
+
+# ----------------------------------------
+def find_columnar_split_points(file_name, split_count):
+    # --split between row groups so each range has about the same number of rows
+    row_counts = get_columnar_row_counts(file_name)
+    total_rows = sum(row_counts)
+    split_points = [0]
+    rows_so_far = 0
+    for unit_num, row_count in enumerate(row_counts[:-1]):
+        rows_so_far += row_count
+        if rows_so_far >= total_rows * len(split_points) / split_count:
+            split_points.append(unit_num + 1)
+    return split_points + [len(row_counts)]
+
+
+# ----------------------------------------
+def read_columnar_batches(file_name, column_list, start_unit, end_unit, batch_size):
+    pyarrow = import_pyarrow()
+    if get_columnar_ext(file_name) == ".parquet":
+        parquet_file = pyarrow.parquet.ParquetFile(file_name)
+        end_unit = parquet_file.num_row_groups if end_unit is None else end_unit
+        if start_unit < end_unit:
+            yield from parquet_file.iter_batches(
+                batch_size=batch_size,
+                row_groups=range(start_unit, end_unit),
+                columns=column_list,
+            )
+        parquet_file.close()
+        return
+    with pyarrow.ipc.open_file(file_name) as ipc_reader:
+        end_unit = ipc_reader.num_record_batches if end_unit is None else end_unit
+        for batch_num in range(start_unit, end_unit):
+            yield ipc_reader.get_batch(batch_num).select(column_list)
+
+
+# ----------------------------------------
+def get_compression_ext(file_name):
+    file_ext = os.path.splitext(file_name)[1].lower()
+    return file_ext if file_ext in compression_exts else ""
+
+
+# ----------------------------------------
+def open_input_file(file_name):
+    compression_ext = get_compression_ext(file_name)
+    if compression_ext == ".gz":
+        return gzip.open(file_name, "rb")
+    if compression_ext == ".bz2":
+        return bz2.open(file_name, "rb")
+    if compression_ext == ".xz":
+        return lzma.open(file_name, "rb")
+    if compression_ext == ".zst":
+        if not zstandard:
+            raise ValueError("the zstandard package is required to read %s" % file_name)
+        return io.BufferedReader(zstandard.open(file_name, "rb"), buffer_size=io_buffer_size)
+    return open(file_name, "rb", buffering=io_buffer_size)
+
+
+# ----------------------------------------
+def seek_input_file(file_handle, offset):
+    if file_handle.seekable():
+        file_handle.seek(offset)
+        return
+    # --zstandard streams can only be read forward, a buffer at a time so a resume deep
+    # --into a large file does not hold everything before it in memory
+    remaining = offset
+    while remaining > 0:
+        skipped = len(file_handle.read(min(remaining, io_buffer_size)))
+        if not skipped:
+            raise ValueError("the input file ends before offset %s" % offset)
+        remaining -= skipped
+
+
+# ----------------------------------------
+def open_output_file(file_name, resume_offset=None):
+    compression_ext = get_compression_ext(file_name)
+    if resume_offset is not None:
+        # --drop anything written after the checkpoint and carry on from there
+        if compression_ext:
+            raise ValueError("compressed output files cannot be resumed")
+        file_handle = open(file_name, "r+b", buffering=io_buffer_size)
+        file_handle.truncate(resume_offset)
+        file_handle.seek(resume_offset)
+    elif compression_ext == ".gz":
+        file_handle = gzip.open(file_name, "wb", compresslevel=6)
+    elif compression_ext == ".bz2":
+        file_handle = bz2.open(file_name, "wb")
+    elif compression_ext == ".xz":
+        file_handle = lzma.open(file_name, "wb")
+    elif compression_ext == ".zst":
+        if not zstandard:
+            raise ValueError("the zstandard package is required to write %s" % file_name)
+        file_handle = zstandard.open(file_name, "wb")
+    else:
+        file_handle = open(file_name, "wb", buffering=io_buffer_size)
+    return file_handle
+
+
+# ----------------------------------------
+def get_part_file_name(output_file, part_num):
+    return get_suffixed_file_name(output_file, "-%03d" % part_num)
+
+
+# ----------------------------------------
+def get_suffixed_file_name(output_file, suffix):
+    # --keep the compression extension last so the file is opened the same way
+    compression_ext = get_compression_ext(output_file)
+    file_root, file_ext = os.path.splitext(output_file[: -len(compression_ext) or None])
+    return "%s%s%s%s" % (file_root, suffix, file_ext, compression_ext)
+
+
+# ----------------------------------------
+def get_report_file_name(file_name, suffix):
+    # --reports are plain json files named after the log or output file
+    compression_ext = get_compression_ext(file_name)
+    file_root = os.path.splitext(file_name[: -len(compression_ext) or None])[0]
+    return "%s%s.json" % (file_root, suffix)
+
+
+# ----------------------------------------
+def sync_output_file(file_handle):
+    file_handle.flush()
+    os.fsync(file_handle.fileno())
+    return file_handle.tell()
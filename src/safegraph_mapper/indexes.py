@@ -0,0 +1,670 @@
+# --the record id indexes kept on disk, the previous release's for delta runs, the duplicate
+# --record ids and the placekeys for the parent check, all keyed by get_key_hash()
+
+import os
+import csv
+import hashlib
+import shutil
+import operator
+import mmap
+import bisect
+import heapq
+import struct
+import tempfile
+import array
+import itertools
+
+from .files import get_columnar_ext, get_compression_ext, open_input_file, open_output_file, read_columnar_batches
+from .readers import csv_dialect, get_column_indexes, line_reader, mmap_reader, projected_csv_reader, projected_reader
+from .mapping import mapper
+
+index_magic = b"SGDELTA2"
+old_index_magic = b"SGDELTA1"
+index_header_size = 16
+index_entry_struct = struct.Struct("=QQQ")
+old_index_entry_struct = struct.Struct("=QQ")
+run_entry_struct = struct.Struct("=QQ")
+placekey_index_magic = b"SGPLACE1"
+duplicate_index_magic = b"SGDUPES2"
+duplicate_entry_struct = struct.Struct("=QQQ")
+file_position_bits = 40
+# --fan out histogram buckets, the lowest number of children in each
+fan_out_bins = [1, 2, 6, 11, 51, 101, 501, 1001]
+fan_out_labels = ["1", "2-5", "6-10", "11-50", "51-100", "101-500", "501-1000", "1001+"]
+
+
+# =========================
+class bloom_filter:
+
+    # ----------------------------------------
+    def __init__(self, byte_count, hash_count=5):
+
+        # --the bit positions come from the two halves of a 64 bit key hash, so no
+        # --more hashing is done per key
+        self.bits = bytearray(byte_count)
+        self.bit_count = byte_count * 8
+        self.hash_count = hash_count
+
+    # ----------------------------------------
+    def add(self, key_hash):
+        # --returns True when every bit was already set, the key has probably been seen
+        bits = self.bits
+        bit_count = self.bit_count
+        hash_1 = key_hash & 0xFFFFFFFF
+        hash_2 = key_hash >> 32 | 1
+        seen = True
+        for i in range(self.hash_count):
+            bit_num = (hash_1 + i * hash_2) % bit_count
+            bit_mask = 1 << (bit_num & 7)
+            if not bits[bit_num >> 3] & bit_mask:
+                bits[bit_num >> 3] |= bit_mask
+                seen = False
+        return seen
+
+    # ----------------------------------------
+    def get_fill_ratio(self):
+        # --the share of bits set, the false positive rate is about this to the power
+        # --of the hash count
+        bits_set = sum(
+            int.from_bytes(self.bits[i : i + 1048576], "little").bit_count() for i in range(0, len(self.bits), 1048576)
+        )
+        return bits_set / self.bit_count
+
+
+# =========================
+class duplicate_index:
+
+    # ----------------------------------------
+    def __init__(self, index_file, policy):
+
+        # --sorted (key hash, position, key offset) entries for every record with a record
+        # --id that occurs more than once, in input order for each record id and memory
+        # --mapped like the delta index, the record ids follow the entries one per line
+        # --so a hash match can be confirmed
+        self.policy = policy
+        self.index_file_handle = open(index_file, "rb")
+        self.index_map = mmap.mmap(self.index_file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index_map[:8] != duplicate_index_magic:
+            raise ValueError("%s is not a duplicate index file" % index_file)
+        entry_count = struct.unpack("=Q", self.index_map[8:index_header_size])[0]
+        self.keys_offset = index_header_size + entry_count * duplicate_entry_struct.size
+        index_entries = memoryview(self.index_map)[index_header_size : self.keys_offset].cast("Q")
+        self.key_hashes = index_entries[0::3]
+        self.positions = index_entries[1::3]
+        self.key_offsets = index_entries[2::3]
+
+    # ----------------------------------------
+    def check_record(self, sg_mapper, json_data, position):
+        # --the first record with a record id is kept, the policy decides what happens
+        # --to the later ones: report keeps them as they are, first drops them and
+        # --rename numbers them in input order, PLACEKEY-2, PLACEKEY-3 and so on
+        record_id = json_data.get("RECORD_ID")
+        if not record_id or not self.key_hashes:
+            return json_data
+        key_hash = get_key_hash(record_id)
+        i = bisect.bisect_left(self.key_hashes, key_hash)
+        occurrence_num = 0
+        while i < len(self.key_hashes) and self.key_hashes[i] == key_hash:
+            if self.get_key(i) == record_id:
+                occurrence_num += 1
+                if self.positions[i] == position:
+                    break
+            i += 1
+        else:
+            return json_data
+        if occurrence_num == 1:
+            return json_data
+        sg_mapper.update_stat("!INFO", "DUPLICATE_RECORD_ID", record_id)
+        if self.policy == "first":
+            return None
+        if self.policy == "rename":
+            json_data["RECORD_ID"] = "%s-%s" % (record_id, occurrence_num)
+        return json_data
+
+    # ----------------------------------------
+    def get_key(self, entry_num):
+        key_start = self.keys_offset + self.key_offsets[entry_num]
+        key_end = self.index_map.find(b"\n", key_start)
+        return self.index_map[key_start:key_end].decode("utf-8")
+
+    # ----------------------------------------
+    def close(self):
+        self.key_hashes.release()
+        self.positions.release()
+        self.key_offsets.release()
+        self.index_map.close()
+        self.index_file_handle.close()
+
+
+# =========================
+class delta_index:
+
+    # ----------------------------------------
+    def __init__(self, index_file, run_file_prefix, run_size=500000):
+
+        # --the previous run's index is memory mapped, its sorted key hashes are
+        # --binary searched in place without loading anything and a hash match is
+        # --confirmed against the record id stored after the entries
+        self.index_file_handle = None
+        self.index_map = None
+        self.old_keys = []
+        self.old_hashes = []
+        self.key_offsets = []
+        self.keys_offset = 0
+        if index_file and os.path.exists(index_file):
+            self.index_file_handle = open(index_file, "rb")
+            self.index_map = mmap.mmap(self.index_file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.index_map[:8] == old_index_magic:
+                raise ValueError("%s has to be upgraded with upgrade_delta_index() first" % index_file)
+            entry_count = read_index_header(self.index_map)
+            self.keys_offset = index_header_size + entry_count * index_entry_struct.size
+            index_entries = memoryview(self.index_map)[index_header_size : self.keys_offset].cast("Q")
+            self.old_keys = index_entries[0::3]
+            self.old_hashes = index_entries[1::3]
+            self.key_offsets = index_entries[2::3]
+
+        # --this run's entries are sorted in runs on disk and merged into the new index
+        self.run_file_prefix = run_file_prefix
+        self.run_size = run_size
+        self.run_count = 0
+        self.entries = []
+
+    # ----------------------------------------
+    def check_record(self, record_id, record_hash):
+        key_hash = get_key_hash(record_id)
+        self.entries.append((key_hash, record_id, record_hash))
+        if len(self.entries) >= self.run_size:
+            self.write_run()
+
+        i = bisect.bisect_left(self.old_keys, key_hash)
+        while i < len(self.old_keys) and self.old_keys[i] == key_hash:
+            if self.get_key(i) == record_id:
+                return "CHANGED" if self.old_hashes[i] != record_hash else "UNCHANGED"
+            i += 1
+        return "NEW"
+
+    # ----------------------------------------
+    def get_key(self, entry_num):
+        key_start = self.keys_offset + self.key_offsets[entry_num]
+        key_end = self.index_map.find(b"\n", key_start)
+        return self.index_map[key_start:key_end].decode("utf-8")
+
+    # ----------------------------------------
+    def write_run(self):
+        self.entries.sort()
+        self.run_count += 1
+        with open("%s-%04d" % (self.run_file_prefix, self.run_count), "wb") as outfile:
+            for key_hash, record_id, record_hash in self.entries:
+                outfile.write(run_entry_struct.pack(key_hash, record_hash))
+                outfile.write(record_id.encode("utf-8") + b"\n")
+        self.entries = []
+
+    # ----------------------------------------
+    def close(self):
+        if self.entries:
+            self.write_run()
+        if self.index_map:
+            self.old_keys.release()
+            self.old_hashes.release()
+            self.key_offsets.release()
+            self.index_map.close()
+            self.index_file_handle.close()
+
+
+# ----------------------------------------
+def get_key_hash(record_id):
+    return int.from_bytes(hashlib.blake2b(record_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# ----------------------------------------
+def read_index_header(index_map):
+    if index_map[:8] not in (index_magic, old_index_magic):
+        raise ValueError("not a delta index file")
+    return struct.unpack("=Q", index_map[8:index_header_size])[0]
+
+
+# ----------------------------------------
+def read_index_run(run_file):
+    with open(run_file, "rb") as infile:
+        while True:
+            packed_entry = infile.read(run_entry_struct.size)
+            if not packed_entry:
+                break
+            key_hash, record_hash = run_entry_struct.unpack(packed_entry)
+            yield key_hash, infile.readline()[:-1].decode("utf-8"), record_hash
+
+
+# ----------------------------------------
+def read_index_entries(index_file):
+    # --index layout: header, (key hash, record hash, key offset) entries sorted by key
+    # --hash and record id, then the record ids one per line in the same order, the
+    # --SGDELTA1 layout before it had no key offsets and only sorted by key hash
+    with open(index_file, "rb") as infile:
+        index_header = infile.read(index_header_size)
+        entry_count = read_index_header(index_header)
+        entry_struct = old_index_entry_struct if index_header[:8] == old_index_magic else index_entry_struct
+        packed_entries = infile.read(entry_count * entry_struct.size)
+        entries = (
+            (
+                entry_struct.unpack_from(packed_entries, entry_num * entry_struct.size),
+                infile.readline()[:-1].decode("utf-8"),
+            )
+            for entry_num in range(entry_count)
+        )
+        # --record ids that share a key hash are put in record id order for the merge
+        for key_hash, hash_entries in itertools.groupby(entries, key=lambda x: x[0][0]):
+            for index_entry, record_id in sorted(hash_entries, key=operator.itemgetter(1)):
+                yield key_hash, record_id, index_entry[1]
+
+
+# ----------------------------------------
+def write_index_entries(index_file, entries):
+    # --entries are (key hash, record id, record hash) in key hash and record id order
+    entry_count = 0
+    with (
+        open(index_file + ".tmp", "wb") as index_file_handle,
+        tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(index_file))) as record_id_file_handle,
+    ):
+        index_file_handle.write(index_magic + struct.pack("=Q", 0))
+        key_offset = 0
+        for key_hash, record_id, record_hash in entries:
+            record_id = record_id.encode("utf-8") + b"\n"
+            index_file_handle.write(index_entry_struct.pack(key_hash, record_hash, key_offset))
+            record_id_file_handle.write(record_id)
+            key_offset += len(record_id)
+            entry_count += 1
+
+        record_id_file_handle.seek(0)
+        shutil.copyfileobj(record_id_file_handle, index_file_handle)
+        index_file_handle.seek(8)
+        index_file_handle.write(struct.pack("=Q", entry_count))
+    os.replace(index_file + ".tmp", index_file)
+    return entry_count
+
+
+# ----------------------------------------
+def upgrade_delta_index(index_file):
+    # --rewrites an SGDELTA1 index with the key offsets delta_index needs, returns
+    # --True when it did
+    with open(index_file, "rb") as infile:
+        if infile.read(8) != old_index_magic:
+            return False
+    write_index_entries(index_file, read_index_entries(index_file))
+    return True
+
+
+# ----------------------------------------
+def write_delta_index(index_file, run_files, delete_file, serialize):
+
+    # --the new entries are merged in key hash and record id order alongside the old
+    # --index, old record ids that are not in the new entries have been deleted
+    delete_count = 0
+    delete_file_handle = open_output_file(delete_file)
+
+    def merge_entries():
+        nonlocal delete_count
+        old_entries = read_index_entries(index_file) if os.path.exists(index_file) else iter([])
+        old_entry = next(old_entries, None)
+        for new_entry in heapq.merge(*[read_index_run(run_file) for run_file in run_files]):
+            while old_entry and old_entry[:2] <= new_entry[:2]:
+                if old_entry[:2] < new_entry[:2]:
+                    delete_file_handle.write(serialize({"DATA_SOURCE": "SAFEGRAPH", "RECORD_ID": old_entry[1]}))
+                    delete_count += 1
+                old_entry = next(old_entries, None)
+            yield new_entry
+        while old_entry:
+            delete_file_handle.write(serialize({"DATA_SOURCE": "SAFEGRAPH", "RECORD_ID": old_entry[1]}))
+            delete_count += 1
+            old_entry = next(old_entries, None)
+
+    entry_count = write_index_entries(index_file, merge_entries())
+    delete_file_handle.close()
+
+    return entry_count, delete_count
+
+
+# =========================
+class placekey_index:
+
+    # ----------------------------------------
+    def __init__(self, index_file):
+
+        # --the sorted placekey hashes are memory mapped and binary searched in place,
+        # --every worker shares the same pages
+        self.index_file_handle = open(index_file, "rb")
+        self.index_map = mmap.mmap(self.index_file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index_map[:8] != placekey_index_magic:
+            raise ValueError("%s is not a placekey index file" % index_file)
+        entry_count = struct.unpack("=Q", self.index_map[8:index_header_size])[0]
+        self.key_hashes = memoryview(self.index_map)[index_header_size : index_header_size + entry_count * 8].cast("Q")
+
+    # ----------------------------------------
+    def __contains__(self, placekey):
+        return self.has_key_hash(get_key_hash(placekey))
+
+    # ----------------------------------------
+    def has_key_hash(self, key_hash):
+        i = bisect.bisect_left(self.key_hashes, key_hash)
+        return i < len(self.key_hashes) and self.key_hashes[i] == key_hash
+
+    # ----------------------------------------
+    def close(self):
+        self.key_hashes.release()
+        self.index_map.close()
+        self.index_file_handle.close()
+
+
+# ----------------------------------------
+def read_place_keys(args, state=None):
+    # --the PLACEKEY and PARENT_PLACEKEY of every row of every input file, cleaned the
+    # --way map() sees them, with the row's position: the offset just past it in a csv
+    # --file or its row number in a parquet or arrow file, the same positions the
+    # --mapping pass sees
+    for file_num, input_file in enumerate(args.input_files):
+        yield from read_file_place_keys(args, input_file, get_position_base(file_num), state)
+        if state and state.is_shut_down():
+            return
+
+
+# ----------------------------------------
+def read_file_place_keys(args, input_file, position_base, state=None):
+    sg_mapper = mapper("off")
+    if get_columnar_ext(input_file):
+        row_number = position_base
+        for record_batch in read_columnar_batches(
+            input_file, ["PLACEKEY", "PARENT_PLACEKEY"], 0, None, args.batch_size
+        ):
+            yield from zip(
+                range(row_number, row_number + record_batch.num_rows),
+                sg_mapper.clean_column(record_batch.column(0)).to_pylist(),
+                sg_mapper.clean_column(record_batch.column(1)).to_pylist(),
+            )
+            row_number += record_batch.num_rows
+            if state and state.is_shut_down():
+                return
+        return
+    with open_input_file(input_file) as input_file_handle:
+        input_reader = line_reader(input_file_handle)
+        header = next(csv.reader(input_reader, dialect=csv_dialect), [])
+        column_indexes = get_column_indexes(header, ["PLACEKEY", "PARENT_PLACEKEY"])
+        if args.reader == "mmap" and not get_compression_ext(input_file):
+            input_reader = input_rows = mmap_reader(input_file_handle, column_indexes, input_reader.offset)
+        elif args.reader in ("mmap", "projected"):
+            input_reader = input_rows = projected_reader(input_reader, column_indexes)
+        else:
+            input_rows = projected_csv_reader(input_reader, len(header), column_indexes)
+        for placekey, parent_placekey in input_rows:
+            yield position_base + input_reader.offset, sg_mapper.clean_value(placekey), sg_mapper.clean_value(
+                parent_placekey
+            )
+            if state and state.is_shut_down():
+                return
+
+
+# ----------------------------------------
+def get_position_base(file_num):
+    # --positions are offsets or row numbers within a file, the file number goes in
+    # --the high bits so positions stay unique across a run of several files
+    return file_num << file_position_bits
+
+
+# ----------------------------------------
+def write_parent_run(run_file, entries):
+    entries.sort()
+    with open(run_file, "wb") as outfile:
+        for key_hash, placekey in entries:
+            outfile.write(struct.pack("=Q", key_hash) + placekey.encode("utf-8") + b"\n")
+    return run_file
+
+
+# ----------------------------------------
+def read_parent_run(run_file):
+    with open(run_file, "rb") as infile:
+        while True:
+            packed_hash = infile.read(8)
+            if not packed_hash:
+                break
+            yield struct.unpack("=Q", packed_hash)[0], infile.readline()[:-1].decode("utf-8")
+
+
+# ----------------------------------------
+def write_hash_run(run_file, key_hashes):
+    key_hashes = array.array("Q", sorted(key_hashes))
+    with open(run_file, "wb") as outfile:
+        key_hashes.tofile(outfile)
+    return run_file
+
+
+# ----------------------------------------
+def read_hash_run(run_file, offset=0, chunk_size=65536):
+    with open(run_file, "rb") as infile:
+        infile.seek(offset)
+        while True:
+            key_hashes = array.array("Q", infile.read(chunk_size * 8))
+            if not key_hashes:
+                break
+            yield from key_hashes
+
+
+# ----------------------------------------
+def build_parent_index(args, index_dir, run_size=1000000, state=None):
+
+    # --first pass: the placekeys and parent pointers go to sorted runs on disk so
+    # --memory stays at one run however big the file is, the placekey runs are then
+    # --merged into one sorted index of 8 byte hashes
+    place_runs = []
+    parent_runs = []
+    place_hashes = []
+    parent_entries = []
+    for _, placekey, parent_placekey in read_place_keys(args, state):
+        if placekey:
+            place_hashes.append(get_key_hash(placekey))
+            if len(place_hashes) >= run_size:
+                place_runs.append(
+                    write_hash_run(
+                        os.path.join(index_dir, "place%04d" % len(place_runs)),
+                        place_hashes,
+                    )
+                )
+                place_hashes = []
+        if parent_placekey and parent_placekey != placekey:
+            parent_entries.append((get_key_hash(parent_placekey), parent_placekey))
+            if len(parent_entries) >= run_size // 4:
+                parent_runs.append(
+                    write_parent_run(
+                        os.path.join(index_dir, "parent%04d" % len(parent_runs)),
+                        parent_entries,
+                    )
+                )
+                parent_entries = []
+    place_runs.append(write_hash_run(os.path.join(index_dir, "place%04d" % len(place_runs)), place_hashes))
+    parent_runs.append(write_parent_run(os.path.join(index_dir, "parent%04d" % len(parent_runs)), parent_entries))
+
+    index_file = os.path.join(index_dir, "placekeys.idx")
+    place_count = 0
+    with open(index_file, "wb") as outfile:
+        outfile.write(placekey_index_magic + struct.pack("=Q", 0))
+        key_hashes = array.array("Q")
+        last_hash = None
+        for key_hash in heapq.merge(*[read_hash_run(x) for x in place_runs]):
+            if key_hash != last_hash:
+                key_hashes.append(key_hash)
+                last_hash = key_hash
+                if len(key_hashes) >= 65536:
+                    key_hashes.tofile(outfile)
+                    place_count += len(key_hashes)
+                    key_hashes = array.array("Q")
+        key_hashes.tofile(outfile)
+        place_count += len(key_hashes)
+        outfile.seek(8)
+        outfile.write(struct.pack("=Q", place_count))
+    for run_file in place_runs:
+        os.remove(run_file)
+
+    # --the merged parent pointers come out grouped by parent, so each parent's
+    # --children are counted and looked up in the index once
+    report = {
+        "places": place_count,
+        "parent_pointers": 0,
+        "parents": 0,
+        "dangling_pointers": 0,
+        "dangling_parents": 0,
+        "fan_out_histogram": dict.fromkeys(fan_out_labels, 0),
+    }
+    largest_parents = []
+    largest_dangling = []
+    index = placekey_index(index_file)
+    parent_groups = itertools.groupby(
+        heapq.merge(*[read_parent_run(x) for x in parent_runs]),
+        key=operator.itemgetter(0),
+    )
+    for key_hash, group in parent_groups:
+        parent_placekey = next(group)[1]
+        child_count = 1 + sum(1 for _ in group)
+        in_file = index.has_key_hash(key_hash)
+        report["parent_pointers"] += child_count
+        report["parents"] += 1
+        report["fan_out_histogram"][fan_out_labels[bisect.bisect_right(fan_out_bins, child_count) - 1]] += 1
+        keep_largest(largest_parents, (child_count, parent_placekey, in_file))
+        if not in_file:
+            report["dangling_pointers"] += child_count
+            report["dangling_parents"] += 1
+            keep_largest(largest_dangling, (child_count, parent_placekey, in_file))
+    index.close()
+    for run_file in parent_runs:
+        os.remove(run_file)
+
+    report["largest_parents"] = [
+        {"PARENT_PLACEKEY": x[1], "children": x[0], "in_file": x[2]} for x in sorted(largest_parents, reverse=True)
+    ]
+    report["largest_dangling_parents"] = [
+        {"PARENT_PLACEKEY": x[1], "children": x[0]} for x in sorted(largest_dangling, reverse=True)
+    ]
+    return index_file, report
+
+
+# ----------------------------------------
+def keep_largest(largest, entry, keep_count=10):
+    if len(largest) < keep_count:
+        heapq.heappush(largest, entry)
+    elif entry > largest[0]:
+        heapq.heapreplace(largest, entry)
+
+
+# ----------------------------------------
+def find_duplicates(args, index_dir, chunk_size=65536, state=None):
+
+    # --first pass: a record id the bloom filter has not seen is new for sure and is
+    # --only logged to disk, the ones it may have seen are candidates kept in memory,
+    # --the log has the key hashes in one file and each position next to the offset
+    # --of its record id in the key file in another
+    bloom = bloom_filter(args.bloom_size * 1048576)
+    hash_file = os.path.join(index_dir, "hashes")
+    position_file = os.path.join(index_dir, "positions")
+    key_file = os.path.join(index_dir, "keys")
+    candidate_hashes = array.array("Q")
+    candidate_positions = array.array("Q")
+    candidate_keys = []
+    record_count = 0
+    with (
+        open(hash_file, "wb") as hash_file_handle,
+        open(position_file, "wb") as position_file_handle,
+        open(key_file, "wb") as key_file_handle,
+    ):
+        key_hashes = array.array("Q")
+        positions = array.array("Q")
+        key_lines = []
+        key_offset = 0
+        for position, placekey, _ in read_place_keys(args, state):
+            if not placekey:
+                continue
+            record_count += 1
+            key_hash = get_key_hash(placekey)
+            if bloom.add(key_hash):
+                candidate_hashes.append(key_hash)
+                candidate_positions.append(position)
+                candidate_keys.append(placekey)
+            else:
+                key_hashes.append(key_hash)
+                positions.append(position)
+                positions.append(key_offset)
+                key_line = placekey.encode("utf-8") + b"\n"
+                key_lines.append(key_line)
+                key_offset += len(key_line)
+                if len(key_hashes) >= chunk_size:
+                    key_hashes.tofile(hash_file_handle)
+                    positions.tofile(position_file_handle)
+                    key_file_handle.write(b"".join(key_lines))
+                    key_hashes = array.array("Q")
+                    positions = array.array("Q")
+                    key_lines = []
+        key_hashes.tofile(hash_file_handle)
+        positions.tofile(position_file_handle)
+        key_file_handle.write(b"".join(key_lines))
+    bloom_fill_ratio = bloom.get_fill_ratio()
+    del bloom
+
+    # --exact check: a candidate is a duplicate if its record id was logged earlier or
+    # --was already a candidate, the log is scanned a chunk at a time for candidate
+    # --hashes and a hash match only counts if the logged record id is the same
+    first_positions = {}
+    candidate_set = set(candidate_hashes)
+    candidate_key_set = set(candidate_keys)
+    with (
+        open(position_file, "rb") as position_file_handle,
+        open(key_file, "rb") as key_file_handle,
+    ):
+        for chunk_num, key_hashes in enumerate(read_hash_chunks(hash_file, chunk_size) if candidate_set else []):
+            for key_hash in candidate_set.intersection(key_hashes):
+                entry_num = -1
+                for _ in range(key_hashes.count(key_hash)):
+                    entry_num = key_hashes.index(key_hash, entry_num + 1)
+                    position_file_handle.seek((chunk_num * chunk_size + entry_num) * 16)
+                    position, key_offset = struct.unpack("=QQ", position_file_handle.read(16))
+                    key_file_handle.seek(key_offset)
+                    placekey = key_file_handle.readline()[:-1].decode("utf-8")
+                    if placekey in candidate_key_set:
+                        first_positions.setdefault(placekey, position)
+    del candidate_set
+    del candidate_key_set
+
+    # --a logged record id is always the first one, the candidates come after it in
+    # --input order
+    key_positions = {x: [y] for x, y in first_positions.items()}
+    for placekey, position in zip(candidate_keys, candidate_positions):
+        key_positions.setdefault(placekey, []).append(position)
+    duplicate_positions = {x: y for x, y in key_positions.items() if len(y) > 1}
+    os.remove(hash_file)
+    os.remove(position_file)
+    os.remove(key_file)
+
+    index_file = os.path.join(index_dir, "duplicates.idx")
+    with open(index_file, "wb") as outfile:
+        outfile.write(duplicate_index_magic + struct.pack("=Q", sum(len(x) for x in duplicate_positions.values())))
+        key_lines = []
+        key_offset = 0
+        for key_hash, placekey in sorted((get_key_hash(x), x) for x in duplicate_positions):
+            for position in duplicate_positions[placekey]:
+                outfile.write(duplicate_entry_struct.pack(key_hash, position, key_offset))
+            key_lines.append(placekey.encode("utf-8") + b"\n")
+            key_offset += len(key_lines[-1])
+        outfile.write(b"".join(key_lines))
+
+    report = {
+        "records": record_count,
+        "bloom_candidates": len(candidate_hashes),
+        "bloom_fill_ratio": round(bloom_fill_ratio, 4),
+        "duplicate_records": sum(len(x) - 1 for x in duplicate_positions.values()),
+        "duplicated_record_ids": len(duplicate_positions),
+    }
+    return index_file, report
+
+
+# ----------------------------------------
+def read_hash_chunks(hash_file, chunk_size):
+    with open(hash_file, "rb") as infile:
+        while True:
+            key_hashes = array.array("Q", infile.read(chunk_size * 8))
+            if not key_hashes:
+                break
+            yield key_hashes
@@ -0,0 +1,170 @@
+# ----load_senzing, mapped records are added straight into a senzing engine by a pool of threads
+
+import time
+import queue
+import threading
+
+from .files import import_optional
+
+
+# =========================
+class senzing_engine:
+
+    # ----------------------------------------
+    def __init__(self, settings):
+
+        # --add_record() is the same call on the version 4 and version 3 engines
+        self.sz_factory = None
+        self.g2_engine = None
+        sz_core = import_optional("senzing_core")
+        g2_api = import_optional("senzing")
+        # --the engine errors worth another try, like a record locked by another thread
+        self.retry_errors = tuple(
+            getattr(g2_api, x) for x in ["SzRetryableError", "G2RetryableException"] if hasattr(g2_api, x)
+        )
+        if sz_core:
+            self.sz_factory = sz_core.SzAbstractFactoryCore("safegraph-mapper", settings)
+            self.engine_add_record = self.sz_factory.create_engine().add_record
+        elif g2_api:
+            self.g2_engine = g2_api.G2Engine()
+            self.g2_engine.init("safegraph-mapper", settings, False)
+            self.engine_add_record = self.g2_engine.addRecord
+        else:
+            raise ValueError("the senzing package is required for --load_senzing")
+
+    # ----------------------------------------
+    def add_record(self, data_source, record_id, record_json):
+        self.engine_add_record(data_source, record_id, record_json)
+
+    # ----------------------------------------
+    def close(self):
+        if self.sz_factory:
+            self.sz_factory.destroy()
+        if self.g2_engine:
+            self.g2_engine.destroy()
+
+
+# =========================
+class record_loader:
+
+    # ----------------------------------------
+    def __init__(
+        self,
+        add_record,
+        thread_count=4,
+        batch_size=100,
+        queue_size=0,
+        retry_errors=(),
+        retry_count=3,
+        retry_seconds=0.5,
+    ):
+
+        # --records are queued in batches for a pool of threads calling add_record(),
+        # --the queue is bounded so mapping waits whenever loading falls behind, errors
+        # --of the retry_errors types are retried retry_count times, waiting twice as
+        # --long each time
+        self.add_record = add_record
+        self.retry_errors = retry_errors
+        self.retry_count = retry_count
+        self.retry_seconds = retry_seconds
+        self.batch_size = batch_size
+        self.batch = []
+        self.batch_queue = queue.Queue(queue_size or thread_count * 2)
+        self.count_lock = threading.Lock()
+        self.loaded_count = 0
+        self.retried_count = 0
+        self.error_count = 0
+        self.error_examples = []
+        self.stall_seconds = 0.0
+        self.threads = [threading.Thread(target=self.load_batches, daemon=True) for _ in range(thread_count)]
+        for thread in self.threads:
+            thread.start()
+
+    # ----------------------------------------
+    def add(self, data_source, record_id, record_json):
+        self.batch.append((data_source, record_id, record_json))
+        if len(self.batch) >= self.batch_size:
+            self.put_batch()
+
+    # ----------------------------------------
+    def put_batch(self):
+        if self.batch_queue.full():
+            stall_start_time = time.perf_counter()
+            self.batch_queue.put(self.batch)
+            self.stall_seconds += time.perf_counter() - stall_start_time
+        else:
+            self.batch_queue.put(self.batch)
+        self.batch = []
+
+    # ----------------------------------------
+    def load_batches(self):
+        add_record = self.add_record
+        while True:
+            batch = self.batch_queue.get()
+            if batch is None:
+                break
+            loaded_count = 0
+            retried_count = 0
+            errors = []
+            for data_source, record_id, record_json in batch:
+                try:
+                    add_record(data_source, record_id, record_json)
+                    loaded_count += 1
+                except self.retry_errors:
+                    try:
+                        retried_count += self.retry_record(data_source, record_id, record_json)
+                        loaded_count += 1
+                    except Exception as err:
+                        retried_count += self.retry_count
+                        errors.append("%s: %s" % (record_id, err))
+                except Exception as err:
+                    errors.append("%s: %s" % (record_id, err))
+            with self.count_lock:
+                self.loaded_count += loaded_count
+                self.retried_count += retried_count
+                self.error_count += len(errors)
+                self.error_examples.extend(errors[: 5 - len(self.error_examples)])
+
+    # ----------------------------------------
+    def retry_record(self, data_source, record_id, record_json):
+        # --returns the number of retries it took, the last error is raised if they
+        # --all fail
+        for retry_num in range(1, self.retry_count + 1):
+            time.sleep(self.retry_seconds * 2 ** (retry_num - 1))
+            try:
+                self.add_record(data_source, record_id, record_json)
+                return retry_num
+            except self.retry_errors:
+                if retry_num == self.retry_count:
+                    raise
+        raise RuntimeError("retry_count is 0")
+
+    # ----------------------------------------
+    def close(self):
+        if self.batch:
+            self.put_batch()
+        for _ in self.threads:
+            self.batch_queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        return self.loaded_count, self.error_count
+
+
+# ----------------------------------------
+def finish_loading(loader, engine, sg_mapper):
+    # --waits for the queued records to be added and counts any that failed
+    loaded_count, error_count = loader.close()
+    engine.close()
+    if error_count:
+        stat = sg_mapper.get_stat_entry("!INFO", "LOAD_ERROR")[0]
+        stat["count"] += error_count
+        stat["examples"] = stat.get("examples", []) + loader.error_examples
+    print(
+        "%s records loaded into senzing, %s retries, %s errors, %s seconds waiting on the load queue"
+        % (
+            loaded_count,
+            loader.retried_count,
+            error_count,
+            round(loader.stall_seconds, 1),
+        )
+    )
@@ -0,0 +1,349 @@
+# --progress reporting, the status file and prometheus metrics, the stage profiler and peak memory
+
+import sys
+import os
+import json
+import time
+import threading
+import importlib
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .files import get_columnar_ext, get_columnar_row_counts, get_compression_ext
+
+progress_fields = 5
+metric_list = [
+    ("rows_read_total", "counter", "Rows read from the input", "rows_read"),
+    ("rows_written_total", "counter", "Records written", "rows_written"),
+    ("bytes_read_total", "counter", "Bytes of input read", "bytes_read"),
+    ("bytes_written_total", "counter", "Bytes of json written", "bytes_written"),
+    ("rows_read_per_second", "gauge", "Rows read per second", "rows_read_per_sec"),
+    (
+        "rows_written_per_second",
+        "gauge",
+        "Records written per second",
+        "rows_written_per_sec",
+    ),
+    ("done_ratio", "gauge", "Share of the input mapped so far", "done_ratio"),
+    ("eta_seconds", "gauge", "Estimated seconds left to map", "eta_seconds"),
+    ("workers", "gauge", "Worker processes", "workers"),
+    ("busy_workers", "gauge", "Worker processes mapping a file range", "busy_workers"),
+    (
+        "worker_utilization",
+        "gauge",
+        "Share of the workers mapping a file range",
+        "worker_utilization",
+    ),
+]
+
+
+# =========================
+class run_state:
+
+    # ----------------------------------------
+    def __init__(self, progress_counts=None, shutdown_event=None, in_worker=False):
+
+        # --how the mapping code is told to stop and where it reports its progress, the
+        # --main process has one for the run and init_worker() makes one for each worker
+        # --process, the shutdown event is shared with the workers so an interrupt stops
+        # --them all and progress_counts is the shared array the main process reads
+        self.progress_counts = progress_counts
+        self.shutdown_event = shutdown_event
+        self.in_worker = in_worker
+        self.shut_down = False
+
+    # ----------------------------------------
+    def request_shutdown(self):
+        self.shut_down = True
+        if self.shutdown_event:
+            self.shutdown_event.set()
+
+    # ----------------------------------------
+    def is_shut_down(self):
+        return self.shut_down or bool(self.shutdown_event and self.shutdown_event.is_set())
+
+    # ----------------------------------------
+    def set_progress(self, part_num, *range_counts):
+        # --rows read, rows written, input position within the range, bytes written and
+        # --the range's state (1 mapping, 2 done) for the main process to report
+        if self.progress_counts is not None:
+            self.progress_counts[part_num * progress_fields : part_num * progress_fields + len(range_counts)] = (
+                range_counts
+            )
+
+
+# =========================
+class run_monitor:
+
+    # ----------------------------------------
+    def __init__(self, worker_count, status_file=None, metrics_port=0, interval=5):
+
+        # --samples the progress the mapping processes leave in the shared counts,
+        # --progress_fields of them per file range, every interval seconds for the
+        # --status file and the metrics endpoint
+        self.worker_count = worker_count
+        self.status_file = status_file
+        self.interval = interval
+        self.phase = "starting"
+        self.progress_counts = []
+        self.range_sizes = []
+        self.start_time = time.time()
+        self.last_sample = (self.start_time, 0, 0, 0)
+        self.status = self.get_status("running")
+        self.server = start_metrics_server(self, metrics_port) if metrics_port else None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.update_status_loop, daemon=True)
+        self.thread.start()
+
+    # ----------------------------------------
+    def watch(self, progress_counts, range_sizes, worker_count):
+        # --range_sizes are (start, size, unit_bytes) per file range in the units the
+        # --range is read in, bytes of a csv file or rows of a parquet or arrow file,
+        # --the size is None for compressed csv files as it is not known up front
+        self.progress_counts = progress_counts
+        self.range_sizes = range_sizes
+        self.worker_count = worker_count
+        self.phase = "mapping"
+
+    # ----------------------------------------
+    def update_status_loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.update_status("running")
+
+    # ----------------------------------------
+    def update_status(self, run_status):
+        self.status = self.get_status(run_status)
+        if self.status_file:
+            # --replaced in one step so readers never see a partly written file
+            with open(self.status_file + ".tmp", "w") as outfile:
+                json.dump(self.status, outfile, indent=4)
+            os.replace(self.status_file + ".tmp", self.status_file)
+
+    # ----------------------------------------
+    def get_status(self, run_status):
+        progress_counts = self.progress_counts[:]
+        range_counts = [
+            progress_counts[i : i + progress_fields] for i in range(0, len(progress_counts), progress_fields)
+        ]
+        rows_read = sum(x[0] for x in range_counts)
+        rows_written = sum(x[1] for x in range_counts)
+        bytes_read = round(sum(x[2] * y[2] for x, y in zip(range_counts, self.range_sizes)))
+        bytes_written = sum(x[3] for x in range_counts)
+        busy_workers = sum(1 for x in range_counts if x[4] == 1)
+
+        sample_time = time.time()
+        last_time, last_rows_read, last_rows_written, last_bytes_read = self.last_sample
+        sample_seconds = max(sample_time - last_time, 0.001)
+        self.last_sample = (sample_time, rows_read, rows_written, bytes_read)
+        elapsed_seconds = sample_time - self.start_time
+
+        # --the eta assumes the rest of the input maps as fast as the part done so far
+        done_ratio = None
+        eta_seconds = None
+        if self.range_sizes and all(x[1] is not None for x in self.range_sizes):
+            total_bytes = sum(x[1] * x[2] for x in self.range_sizes)
+            done_bytes = sum(min(x[2], y[1]) * y[2] for x, y in zip(range_counts, self.range_sizes))
+            done_ratio = done_bytes / total_bytes if total_bytes else 1.0
+            if done_ratio > 0:
+                eta_seconds = round(elapsed_seconds * (1 - done_ratio) / done_ratio)
+            done_ratio = round(done_ratio, 4)
+
+        return {
+            "status": run_status,
+            "phase": self.phase,
+            "elapsed_seconds": round(elapsed_seconds, 1),
+            "rows_read": rows_read,
+            "rows_written": rows_written,
+            "rows_read_per_sec": round((rows_read - last_rows_read) / sample_seconds),
+            "rows_written_per_sec": round((rows_written - last_rows_written) / sample_seconds),
+            "bytes_read": bytes_read,
+            "bytes_written": bytes_written,
+            "bytes_read_per_sec": round((bytes_read - last_bytes_read) / sample_seconds),
+            "input_offsets": [y[0] + x[2] for x, y in zip(range_counts, self.range_sizes)],
+            "done_ratio": done_ratio,
+            "eta_seconds": eta_seconds,
+            "workers": self.worker_count,
+            "busy_workers": busy_workers,
+            "worker_utilization": round(busy_workers / self.worker_count, 4),
+            "file_ranges": len(range_counts),
+            "file_ranges_done": sum(1 for x in range_counts if x[4] == 2),
+        }
+
+    # ----------------------------------------
+    def get_metrics_text(self):
+        # --the prometheus text format, unknown values are left out
+        status = self.status
+        metric_lines = []
+        for metric_name, metric_type, metric_help, status_key in metric_list:
+            if status[status_key] is None:
+                continue
+            metric_lines.append("# HELP safegraph_mapper_%s %s" % (metric_name, metric_help))
+            metric_lines.append("# TYPE safegraph_mapper_%s %s" % (metric_name, metric_type))
+            metric_lines.append("safegraph_mapper_%s %s" % (metric_name, status[status_key]))
+        metric_lines.append("# HELP safegraph_mapper_input_offset Current input offset of each file range")
+        metric_lines.append("# TYPE safegraph_mapper_input_offset gauge")
+        for range_num, input_offset in enumerate(status["input_offsets"]):
+            metric_lines.append('safegraph_mapper_input_offset{file_range="%s"} %s' % (range_num + 1, input_offset))
+        return "\n".join(metric_lines) + "\n"
+
+    # ----------------------------------------
+    def close(self, run_status):
+        self.stop_event.set()
+        self.thread.join()
+        self.phase = "finished"
+        self.update_status(run_status)
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+# =========================
+class stage_profiler:
+
+    # ----------------------------------------
+    def __init__(self, sample_interval):
+
+        # --one row in every sample_interval has its stages timed, so the stage seconds
+        # --are estimates made by scaling those rows back up
+        self.sample_interval = sample_interval
+        self.sampled_rows = 0
+        self.sampled_seconds = {}
+        self.stage_seconds = {}
+        self.start_time = time.time()
+        self.last_time = None
+        self.rows_per_sec = []
+        self.last_progress = (self.start_time, 0)
+
+    # ----------------------------------------
+    def start_row(self):
+        self.last_time = time.perf_counter()
+
+    # ----------------------------------------
+    def end_row(self):
+        self.sampled_rows += 1
+
+    # ----------------------------------------
+    def mark(self, stage):
+        # --charges the time since the last mark to this stage of the sampled row
+        mark_time = time.perf_counter()
+        self.sampled_seconds[stage] = self.sampled_seconds.get(stage, 0.0) + mark_time - self.last_time
+        self.last_time = mark_time
+
+    # ----------------------------------------
+    def add_time(self, stage, seconds):
+        # --for stages that are timed every time, like writing a batch of output
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    # ----------------------------------------
+    def record_progress(self, row_count, min_seconds=1.0):
+        progress_time = time.time()
+        last_time, last_row_count = self.last_progress
+        if progress_time - last_time >= min_seconds:
+            self.rows_per_sec.append(
+                [
+                    round(progress_time - self.start_time, 1),
+                    round((row_count - last_row_count) / (progress_time - last_time)),
+                ]
+            )
+            self.last_progress = (progress_time, row_count)
+
+    # ----------------------------------------
+    def get_stage_seconds(self):
+        stage_seconds = dict(self.stage_seconds)
+        for stage, seconds in self.sampled_seconds.items():
+            stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds * self.sample_interval
+        return stage_seconds
+
+    # ----------------------------------------
+    def get_profile(self):
+        return {
+            "sampled_rows": self.sampled_rows,
+            "stage_seconds": self.get_stage_seconds(),
+            "rows_per_sec": self.rows_per_sec,
+        }
+
+    # ----------------------------------------
+    def merge(self, profile):
+        # --adds in the stage times of a worker's profiler
+        self.sampled_rows += profile["sampled_rows"]
+        for stage, seconds in profile["stage_seconds"].items():
+            self.add_time(stage, seconds)
+        self.rows_per_sec.extend(profile["rows_per_sec"])
+
+    # ----------------------------------------
+    def get_report(self, row_count):
+        elapsed_seconds = time.time() - self.start_time
+        stage_seconds = self.get_stage_seconds()
+        total_seconds = sum(stage_seconds.values()) or 1.0
+        return {
+            "rows": row_count,
+            "elapsed_seconds": round(elapsed_seconds, 1),
+            "rows_per_sec": (round(row_count / elapsed_seconds) if elapsed_seconds else 0),
+            "sample_interval": self.sample_interval,
+            "sampled_rows": self.sampled_rows,
+            "stages": {
+                stage: {
+                    "seconds": round(seconds, 3),
+                    "percent": round(seconds * 100 / total_seconds, 1),
+                }
+                for stage, seconds in sorted(stage_seconds.items(), key=lambda x: x[1], reverse=True)
+            },
+            "rows_per_sec_series": self.rows_per_sec,
+        }
+
+
+# ----------------------------------------
+def get_range_sizes(input_file, file_ranges):
+    # --(start, size, unit_bytes) of each file range for run_monitor.watch()
+    if get_columnar_ext(input_file):
+        row_counts = get_columnar_row_counts(input_file)
+        unit_bytes = os.path.getsize(input_file) / max(sum(row_counts), 1)
+        return [
+            (
+                sum(row_counts[:start_unit]),
+                sum(row_counts[start_unit:end_unit]),
+                unit_bytes,
+            )
+            for start_unit, end_unit in file_ranges
+        ]
+    if get_compression_ext(input_file):
+        return [(start_offset, None, 1) for start_offset, _ in file_ranges]
+    file_size = os.path.getsize(input_file)
+    return [(start_offset, (end_offset or file_size) - start_offset, 1) for start_offset, end_offset in file_ranges]
+
+
+# ----------------------------------------
+def start_metrics_server(monitor, port):
+    # --serves the monitor's metrics on localhost only, http.server is imported here
+    # --as most runs never need it
+    http_server = importlib.import_module("http.server")
+
+    class metrics_handler(http_server.BaseHTTPRequestHandler):
+
+        # ----------------------------------------
+        def do_GET(self):
+            response = monitor.get_metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        # ----------------------------------------
+        def log_message(self, *args):
+            pass
+
+    server = http_server.ThreadingHTTPServer(("127.0.0.1", port), metrics_handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ----------------------------------------
+def get_peak_rss_mb(who):
+    # --ru_maxrss is KB on linux and bytes on macos, for RUSAGE_CHILDREN it is the
+    # --largest of the finished worker processes
+    peak_rss = resource.getrusage(who).ru_maxrss
+    return round(peak_rss / (1048576 if sys.platform == "darwin" else 1024), 1)
@@ -0,0 +1,684 @@
+# --the csv readers, line_reader and pipelined_line_reader hand lines to the csv module and the
+# --projected and mmap readers only decode the columns that get mapped
+
+import os
+import sys
+import csv
+import time
+import operator
+import re
+import io
+import mmap
+import itertools
+import queue
+import threading
+
+from .files import get_columnar_ext, open_input_file, read_columnar_header
+
+csv_dialect = "excel"
+large_columns = ["POLYGON_WKT"]
+
+csv.field_size_limit(sys.maxsize)
+
+
+# =========================
+class line_reader:
+
+    # ----------------------------------------
+    def __init__(self, file_handle, offset=0, end_offset=None, encoding="utf-8"):
+
+        # --the file handle must be binary and positioned at the offset of the first line
+        self.file_handle = file_handle
+        self.offset = offset
+        self.end_offset = end_offset
+        self.encoding = encoding
+
+    # ----------------------------------------
+    def __iter__(self):
+        return self
+
+    # ----------------------------------------
+    def __next__(self):
+        if self.end_offset is not None and self.offset >= self.end_offset:
+            raise StopIteration
+        line = self.file_handle.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode(self.encoding)
+
+    # ----------------------------------------
+    def read_chunk(self, chunk_size=1048576):
+        # --the raw bytes of the next chunk of the file, it may end part way into a line
+        read_size = chunk_size
+        if self.end_offset is not None:
+            read_size = min(read_size, self.end_offset - self.offset)
+        chunk = self.file_handle.read(read_size) if read_size > 0 else b""
+        self.offset += len(chunk)
+        return chunk
+
+
+# =========================
+class pipelined_line_reader:
+
+    # ----------------------------------------
+    def __init__(
+        self,
+        file_handle,
+        offset=0,
+        end_offset=None,
+        encoding="utf-8",
+        chunk_size=1048576,
+        queue_size=8,
+    ):
+
+        # --a reader thread fills a bounded queue with chunks of whole lines so reading
+        # --and decompressing overlap with mapping, lines come out just like line_reader
+        self.file_handle = file_handle
+        self.offset = offset
+        self.end_offset = end_offset
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.chunk_queue = queue.Queue(queue_size)
+        self.chunk_lines = io.BytesIO()
+        self.finished = False
+        self.stall_seconds = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.read_chunks, args=(offset,), daemon=True)
+        self.thread.start()
+
+    # ----------------------------------------
+    def read_chunks(self, read_offset):
+        try:
+            while not self.stop_event.is_set():
+                read_size = self.chunk_size
+                if self.end_offset is not None:
+                    read_size = min(read_size, self.end_offset - read_offset)
+                chunk = self.file_handle.read(read_size) if read_size > 0 else b""
+                if not chunk:
+                    break
+                # --end the chunk on a line, the end offset is always the start of one
+                if not chunk.endswith(b"\n") and (
+                    self.end_offset is None or read_offset + len(chunk) < self.end_offset
+                ):
+                    chunk += self.file_handle.readline()
+                read_offset += len(chunk)
+                self.put_chunk(chunk)
+        except Exception as err:
+            self.put_chunk(err)
+        self.put_chunk(None)
+
+    # ----------------------------------------
+    def put_chunk(self, chunk):
+        while not self.stop_event.is_set():
+            try:
+                self.chunk_queue.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    # ----------------------------------------
+    def __iter__(self):
+        return self
+
+    # ----------------------------------------
+    def __next__(self):
+        line = self.chunk_lines.readline()
+        if not line:
+            line = self.next_chunk_line()
+        self.offset += len(line)
+        return line.decode(self.encoding)
+
+    # ----------------------------------------
+    def next_chunk_line(self):
+        chunk = self.get_chunk()
+        if not chunk:
+            raise StopIteration
+        self.chunk_lines = io.BytesIO(chunk)
+        return self.chunk_lines.readline()
+
+    # ----------------------------------------
+    def read_chunk(self):
+        # --the raw bytes of the rest of the current chunk or of the next one
+        chunk = self.chunk_lines.read() or self.get_chunk()
+        self.offset += len(chunk)
+        return chunk
+
+    # ----------------------------------------
+    def get_chunk(self):
+        if self.finished:
+            return b""
+        if self.chunk_queue.empty():
+            stall_start_time = time.perf_counter()
+            chunk = self.chunk_queue.get()
+            self.stall_seconds += time.perf_counter() - stall_start_time
+        else:
+            chunk = self.chunk_queue.get()
+        if chunk is None:
+            self.finished = True
+            return b""
+        if isinstance(chunk, Exception):
+            self.finished = True
+            raise chunk
+        return chunk
+
+    # ----------------------------------------
+    def get_status(self):
+        return "read queue %s/%s, %ss waiting on reads" % (
+            self.chunk_queue.qsize(),
+            self.chunk_queue.maxsize,
+            round(self.stall_seconds, 1),
+        )
+
+    # ----------------------------------------
+    def close(self):
+        # --the reader thread may be waiting on a full queue if mapping stopped early
+        self.stop_event.set()
+        while not self.chunk_queue.empty():
+            self.chunk_queue.get_nowait()
+        self.thread.join()
+
+
+# =========================
+class record_scanner:
+
+    # ----------------------------------------
+    def __init__(
+        self,
+        column_indexes,
+        skip_column_indexes=(),
+        encoding="utf-8",
+        max_field_size=0,
+        delimiter=",",
+        quotechar='"',
+    ):
+
+        # --records are matched on the raw bytes a segment at a time, only the projected
+        # --fields are captured and decoded, and the large columns between segments (like
+        # --POLYGON_WKT) are stepped over with find() instead of the regex engine
+        self.column_indexes = column_indexes
+        self.max_field_size = max_field_size
+        self.column_count = max(column_indexes) + 1
+        self.encoding = encoding
+        self.delimiter = delimiter.encode(encoding)
+        self.quotechar = quotechar.encode(encoding)
+        self.doubled_quotechar = self.quotechar * 2
+        field_pattern = get_field_pattern(delimiter, quotechar).encode(encoding)
+        segment_columns = [[]]
+        for column_index in range(self.column_count):
+            if column_index in skip_column_indexes and column_index not in column_indexes:
+                segment_columns.append([])
+            else:
+                segment_columns[-1].append(column_index)
+        self.segment_matches = [
+            re.compile(get_segment_pattern(x, column_indexes, field_pattern, self.delimiter)).match
+            for x in segment_columns
+        ]
+        self.last_segment_match = self.segment_matches.pop()
+
+        # --the groups come out in column order and are put back in column_indexes order
+        group_columns = [x for x in itertools.chain(*segment_columns) if x in column_indexes]
+        self.get_projected_values = (
+            operator.itemgetter(*[group_columns.index(x) for x in column_indexes]) if len(column_indexes) > 1 else tuple
+        )
+        self.field_match = re.compile(get_field_pattern(delimiter, quotechar, unbalanced=True).encode(encoding)).match
+
+        # --the rest of a quoted or unquoted field from part way into it
+        self.quoted_rest_match = re.compile(
+            "[^{q}]*(?:{q}{q}[^{q}]*)*".format(q=re.escape(quotechar)).encode(encoding)
+        ).match
+        self.unquoted_rest_match = re.compile("[^{d}\\r\\n]*".format(d=re.escape(delimiter)).encode(encoding)).match
+
+    # ----------------------------------------
+    def scan(self, buffer, position):
+        # --returns the projected values of the record at position and the offset just
+        # --past its end, a segment longer than max_field_size may hold a projected field
+        # --that is too large so the record is left to scan_fields() to check
+        record_start = position
+        max_field_size = self.max_field_size
+        groups = ()
+        for segment_match in self.segment_matches:
+            segment_matched = segment_match(buffer, position)
+            if not segment_matched or (max_field_size and segment_matched.end() - position > max_field_size):
+                return self.scan_fields(buffer, record_start)
+            groups += segment_matched.groups()
+            position = self.skip_field(buffer, segment_matched.end())
+            if position < 0:
+                return self.scan_fields(buffer, record_start)
+        segment_matched = self.last_segment_match(buffer, position)
+        if not segment_matched or (max_field_size and segment_matched.end() - position > max_field_size):
+            return self.scan_fields(buffer, record_start)
+        groups += segment_matched.groups()
+
+        quotechar = self.quotechar
+        encoding = self.encoding
+        values = [
+            (
+                value.decode(encoding)
+                if value[:1] != quotechar
+                else value[1:-1].replace(self.doubled_quotechar, quotechar).decode(encoding)
+            )
+            for value in self.get_projected_values(groups)
+        ]
+        return values, segment_matched.end()
+
+    # ----------------------------------------
+    def skip_field(self, buffer, position):
+        # --returns the offset of the next field, or -1 if the field does not end in a
+        # --delimiter, so the record is left to scan_fields()
+        quotechar = self.quotechar
+        if buffer[position : position + 1] == quotechar:
+            quote_position = buffer.find(quotechar, position + 1)
+            while quote_position != -1 and buffer[quote_position + 1 : quote_position + 2] == quotechar:
+                quote_position = buffer.find(quotechar, quote_position + 2)
+            if quote_position == -1 or buffer[quote_position + 1 : quote_position + 2] != self.delimiter:
+                return -1
+            return quote_position + 2
+        delimiter_position = buffer.find(self.delimiter, position)
+        if delimiter_position == -1 or buffer.find(b"\n", position, delimiter_position) != -1:
+            return -1
+        return delimiter_position + 1
+
+    # ----------------------------------------
+    def get_field_spans(self, buffer, position):
+        # --the start and end of each field of the record at position and the offset
+        # --just past its end, a quote left open runs to the end of the buffer
+        field_spans = []
+        buffer_size = len(buffer)
+        while True:
+            field_end = self.field_match(buffer, position).end()
+            field_spans.append((position, field_end))
+            if field_end >= buffer_size:
+                return field_spans, buffer_size
+            if buffer[field_end : field_end + 1] == self.delimiter:
+                position = field_end + 1
+            elif buffer[field_end : field_end + 2] == b"\r\n":
+                return field_spans, field_end + 2
+            else:
+                return field_spans, field_end + 1
+
+    # ----------------------------------------
+    def scan_fields(self, buffer, position):
+        # --short rows and unusual quoting, each field is matched on its own and only the
+        # --projected ones are copied out, quoted ones are unquoted by the csv module
+        field_spans, record_end = self.get_field_spans(buffer, position)
+        if self.max_field_size:
+            self.check_field_sizes(buffer, field_spans)
+        values = []
+        for column_index in self.column_indexes:
+            if column_index >= len(field_spans):
+                values.append("")
+                continue
+            field_start, field_end = field_spans[column_index]
+            value = buffer[field_start:field_end].decode(self.encoding)
+            if value[:1] == self.quotechar.decode(self.encoding):
+                value = next(csv.reader([value], dialect=csv_dialect))[0]
+            values.append(value)
+        return values, record_end
+
+    # ----------------------------------------
+    def check_field_sizes(self, buffer, field_spans):
+        # --only a projected field larger than max_field_size stops the run, the others
+        # --are never copied out so their size does not matter, the size is measured
+        # --without the quotes like the csv reader does
+        for column_index in self.column_indexes:
+            if column_index >= len(field_spans):
+                continue
+            field_start, field_end = field_spans[column_index]
+            if field_end - field_start > self.max_field_size:
+                field = buffer[field_start:field_end]
+                if field[:1] == self.quotechar:
+                    field = field[1:-1].replace(self.doubled_quotechar, self.quotechar)
+                if len(field) > self.max_field_size:
+                    raise ValueError(
+                        "mapped field in column %s is larger than the field limit (%s), raise --max_field_size to map this file"
+                        % (column_index + 1, self.max_field_size)
+                    )
+
+
+# =========================
+class mmap_reader:
+
+    # ----------------------------------------
+    def __init__(
+        self,
+        file_handle,
+        column_indexes,
+        offset=0,
+        end_offset=None,
+        encoding="utf-8",
+        skip_column_indexes=(),
+        max_field_size=0,
+    ):
+
+        # --records are scanned on the memory mapped file itself, so only the projected
+        # --fields are ever copied out of it and the rest of each record, quoted newlines
+        # --in POLYGON_WKT included, is stepped over in place
+        self.buffer = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self.buffer, "madvise"):
+            self.buffer.madvise(mmap.MADV_SEQUENTIAL)
+        self.offset = offset
+        # --pages already read are let go every megabyte so they do not add up in the
+        # --process's resident memory, they stay in the page cache
+        self.released_offset = offset - offset % mmap.PAGESIZE
+        self.release_size = 1048576
+        self.end_offset = len(self.buffer) if end_offset is None else end_offset
+        self.scan = record_scanner(column_indexes, skip_column_indexes, encoding, max_field_size).scan
+
+    # ----------------------------------------
+    def __iter__(self):
+        return self
+
+    # ----------------------------------------
+    def __next__(self):
+        buffer = self.buffer
+        while self.offset < self.end_offset and buffer[self.offset] in (10, 13):
+            self.offset += 1
+        if self.offset >= self.end_offset:
+            raise StopIteration
+        values, self.offset = self.scan(buffer, self.offset)
+        if self.offset - self.released_offset >= self.release_size:
+            self.release_pages()
+        return values
+
+    # ----------------------------------------
+    def release_pages(self):
+        release_offset = self.offset - self.offset % mmap.PAGESIZE
+        if hasattr(mmap, "MADV_DONTNEED"):
+            self.buffer.madvise(
+                mmap.MADV_DONTNEED,
+                self.released_offset,
+                release_offset - self.released_offset,
+            )
+        self.released_offset = release_offset
+
+    # ----------------------------------------
+    def close(self):
+        self.buffer.close()
+
+
+# =========================
+class projected_reader:
+
+    # ----------------------------------------
+    def __init__(
+        self,
+        lines,
+        column_indexes,
+        encoding="utf-8",
+        skip_column_indexes=(),
+        max_field_size=0,
+    ):
+
+        # --reads raw chunks from a line_reader or pipelined_line_reader and scans the
+        # --whole records in them like mmap_reader does, so only the projected fields
+        # --are decoded, a record still open at the end of a chunk is carried over
+        self.lines = lines
+        self.offset = lines.offset
+        self.scanner = record_scanner(column_indexes, skip_column_indexes, encoding, max_field_size)
+        self.scan = self.scanner.scan
+        self.max_field_size = max_field_size
+        # --the rest of a field that was cut short is dropped with this as it is read
+        self.drop_match = None
+        self.buffer = b""
+        self.buffer_offset = self.offset
+        self.position = 0
+        self.pending = b""
+
+    # ----------------------------------------
+    def __iter__(self):
+        return self
+
+    # ----------------------------------------
+    def __next__(self):
+        buffer = self.buffer
+        while True:
+            while self.position < len(buffer) and buffer[self.position] in (10, 13):
+                self.position += 1
+            if self.position < len(buffer):
+                break
+            if not self.read_records():
+                self.offset = self.buffer_offset + self.position
+                raise StopIteration
+            buffer = self.buffer
+        values, self.position = self.scan(buffer, self.position)
+        self.offset = self.buffer_offset + self.position
+        return values
+
+    # ----------------------------------------
+    def read_records(self):
+        # --fills the buffer with the next run of whole records, False at the end
+        self.buffer_offset += len(self.buffer)
+        self.position = 0
+        parts = [self.pending]
+        parts_size = len(self.pending)
+        in_quotes = self.pending.count(b'"') % 2 == 1
+        while True:
+            chunk = self.lines.read_chunk()
+            if not chunk:
+                self.buffer = b"".join(parts)
+                self.pending = b""
+                return bool(self.buffer)
+            if self.drop_match:
+                chunk = self.drop_field(chunk)
+                if not chunk:
+                    continue
+            records_end = find_last_record_end(chunk, in_quotes)
+            if records_end:
+                parts.append(chunk[:records_end])
+                self.buffer = b"".join(parts)
+                self.pending = chunk[records_end:]
+                return True
+            parts.append(chunk)
+            parts_size += len(chunk)
+            in_quotes ^= chunk.count(b'"') % 2 == 1
+            if self.max_field_size and parts_size > self.max_field_size:
+                record = self.limit_field_sizes(b"".join(parts))
+                parts = [record]
+                parts_size = len(record)
+                in_quotes = record.count(b'"') % 2 == 1
+
+    # ----------------------------------------
+    def limit_field_sizes(self, record):
+        # --the record is still open past max_field_size, a projected field that large
+        # --stops the run and the others are cut short, the rest of a field still open
+        # --is dropped as it is read so an unbalanced quote cannot pull in the whole file
+        field_spans, _ = self.scanner.get_field_spans(record, 0)
+        self.scanner.check_field_sizes(record, field_spans)
+        record_size = len(record)
+        record_parts = []
+        position = 0
+        for field_start, field_end in field_spans:
+            if field_end - field_start <= self.max_field_size:
+                continue
+            cut_end = field_start + self.max_field_size
+            if record[field_start : field_start + 1] == b'"':
+                # --a cut must not leave half of a doubled quote behind
+                record_parts.append(record[position : field_start + 1])
+                record_parts.append(record[field_start + 1 : cut_end].rstrip(b'"'))
+                if field_end < len(record):
+                    record_parts.append(b'"')
+                else:
+                    self.drop_match = self.scanner.quoted_rest_match
+            else:
+                record_parts.append(record[position:cut_end])
+                if field_end == len(record):
+                    self.drop_match = self.scanner.unquoted_rest_match
+            position = field_end
+        record_parts.append(record[position:])
+        record = b"".join(record_parts)
+        self.buffer_offset += record_size - len(record)
+        return record
+
+    # ----------------------------------------
+    def drop_field(self, chunk):
+        # --drops the chunk up to the end of the field being dropped, the bytes dropped
+        # --move the offset of the records in the buffer on
+        field_end = self.drop_match(chunk).end()
+        self.buffer_offset += field_end
+        if field_end < len(chunk):
+            self.drop_match = None
+        return chunk[field_end:]
+
+    # ----------------------------------------
+    def get_status(self):
+        return self.lines.get_status()
+
+    # ----------------------------------------
+    def close(self):
+        self.lines.close()
+
+
+# ----------------------------------------
+def count_quotes(buffer, start, end, block_size=1048576, release_pages=False):
+    # --mmap has find() but no count(), so it is counted a slice at a time, a long
+    # --scan can let go of the pages it has counted so they don't stay resident
+    quote_count = 0
+    for block_start in range(start, end, block_size):
+        block_end = min(block_start + block_size, end)
+        quote_count += buffer[block_start:block_end].count(b'"')
+        if release_pages and hasattr(mmap, "MADV_DONTNEED"):
+            page_start = block_start - block_start % mmap.PAGESIZE
+            buffer.madvise(
+                mmap.MADV_DONTNEED,
+                page_start,
+                block_end - block_end % mmap.PAGESIZE - page_start,
+            )
+    return quote_count
+
+
+# ----------------------------------------
+def find_record_end(buffer, position, in_quotes=False):
+    # --a newline only ends a record outside quotes, returns the offset just past it
+    while True:
+        newline_position = buffer.find(b"\n", position)
+        if newline_position == -1:
+            return len(buffer)
+        in_quotes ^= count_quotes(buffer, position, newline_position) % 2 == 1
+        position = newline_position + 1
+        if not in_quotes:
+            return position
+
+
+# ----------------------------------------
+def find_last_record_end(chunk, in_quotes=False):
+    # --the offset just past the last newline outside quotes, 0 if there is none, the
+    # --chunk starts in quotes if it carries on a record with an open quote
+    quote_count = chunk.count(b'"') + in_quotes
+    position = len(chunk)
+    while True:
+        newline_position = chunk.rfind(b"\n", 0, position)
+        if newline_position == -1:
+            return 0
+        quote_count -= chunk.count(b'"', newline_position, position)
+        if quote_count % 2 == 0:
+            return newline_position + 1
+        position = newline_position
+
+
+# ----------------------------------------
+def find_split_points(file_name, start_offset, split_count):
+
+    # --the quotes are counted on the mapped file from one split point to the next
+    # --target, the file is read once and is then in the page cache for the workers
+    file_size = os.path.getsize(file_name)
+    split_points = [start_offset]
+    if file_size <= start_offset:
+        return split_points + [file_size]
+    with (
+        open(file_name, "rb") as file_handle,
+        mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+    ):
+        position = start_offset
+        for split_num in range(1, split_count):
+            target = start_offset + ((file_size - start_offset) * split_num) // split_count
+            if target < position:
+                continue
+            in_quotes = count_quotes(buffer, position, target, release_pages=True) % 2 == 1
+            position = find_record_end(buffer, target, in_quotes)
+            if position >= file_size:
+                break
+            split_points.append(position)
+
+    return split_points + [file_size]
+
+
+# ----------------------------------------
+def get_column_indexes(header, column_list):
+    missing_columns = [x for x in column_list if x not in header]
+    if missing_columns:
+        raise ValueError("columns missing from header: %s" % ", ".join(missing_columns))
+    return [header.index(x) for x in column_list]
+
+
+# ----------------------------------------
+def get_large_column_indexes(header, column_indexes):
+    # --the large_columns that are not projected, the readers step over them with find()
+    return [header.index(x) for x in large_columns if x in header and header.index(x) not in column_indexes]
+
+
+# ----------------------------------------
+def projected_csv_reader(lines, column_count, column_indexes, max_field_size=0):
+    # --the csv module reads every field, the ones that are not projected are dropped
+    # --whatever their size and only a projected field over max_field_size stops the run
+    get_projected_values = operator.itemgetter(*column_indexes)
+    csv_reader = csv.reader(lines, dialect=csv_dialect)
+    while True:
+        try:
+            row = next(csv_reader)
+        except StopIteration:
+            return
+        except csv.Error as err:
+            raise ValueError("the csv module could not read a record, %s" % err) from err
+        if not row:
+            continue
+        if len(row) < column_count:
+            row += [""] * (column_count - len(row))
+        projected_values = get_projected_values(row)
+        if max_field_size:
+            for column_index, value in zip(column_indexes, projected_values):
+                # --utf-8 takes at most 4 bytes a character
+                if len(value) * 4 > max_field_size and (len(value.encode("utf-8")) > max_field_size):
+                    raise ValueError(
+                        "mapped field in column %s is larger than the field limit (%s), raise --max_field_size to map this file"
+                        % (column_index + 1, max_field_size)
+                    )
+        yield projected_values
+
+
+# ----------------------------------------
+def get_field_pattern(delimiter=",", quotechar='"', unbalanced=False):
+    # --a quoted or unquoted field, the unbalanced form also takes a quote left open
+    # --and anything after a closing quote up to the delimiter, the way the csv module
+    # --reads them
+    if unbalanced:
+        pattern = "(?:{q}[^{q}]*(?:{q}{q}[^{q}]*)*{q}?)?[^{d}\\r\\n]*"
+    else:
+        pattern = "{q}[^{q}]*(?:{q}{q}[^{q}]*)*{q}|(?!{q})[^{d}\\r\\n]*"
+    return pattern.format(q=re.escape(quotechar), d=re.escape(delimiter))
+
+
+# ----------------------------------------
+def get_segment_pattern(segment_columns, column_indexes, field_pattern, delimiter):
+    # --matches the fields of segment_columns up to the delimiter after them, with a
+    # --group for each projected one, the last segment matches the rest of the record
+    column_patterns = [(b"(%s)" if x in column_indexes else b"(?:%s)") % field_pattern for x in segment_columns]
+    delimiter = re.escape(delimiter)
+    if max(column_indexes) not in segment_columns:
+        return delimiter.join(column_patterns) + delimiter if column_patterns else b""
+    return rb"%s(?:%s(?:%s))*(?:\r?\n|$)" % (
+        delimiter.join(column_patterns),
+        delimiter,
+        field_pattern,
+    )
+
+
+# ----------------------------------------
+def read_input_header(input_file):
+    # --the header and where the data starts, parquet and arrow files start at unit 0
+    if get_columnar_ext(input_file):
+        return read_columnar_header(input_file), 0
+    with open_input_file(input_file) as input_file_handle:
+        input_reader = line_reader(input_file_handle)
+        header = next(csv.reader(input_reader, dialect=csv_dialect), [])
+        return header, input_reader.offset
@@ -0,0 +1,904 @@
+# --mapping a file range or a whole file, in this process or in a pool of worker processes
+
+import sys
+import os
+import copy
+import json
+import time
+from datetime import datetime
+import signal
+import shutil
+import multiprocessing
+import tempfile
+import glob
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .files import (
+    find_columnar_split_points,
+    get_columnar_ext,
+    get_columnar_row_counts,
+    get_compression_ext,
+    get_part_file_name,
+    get_report_file_name,
+    import_pyarrow,
+    open_input_file,
+    open_output_file,
+    read_columnar_batches,
+    seek_input_file,
+    sync_output_file,
+)
+from .readers import (
+    find_split_points,
+    get_column_indexes,
+    get_large_column_indexes,
+    line_reader,
+    mmap_reader,
+    pipelined_line_reader,
+    projected_csv_reader,
+    projected_reader,
+    read_input_header,
+)
+from .serializers import get_serializer, json_lines_from_columns, serializers_match
+from .mapping import mapper
+from .indexes import (
+    build_parent_index,
+    delta_index,
+    duplicate_index,
+    find_duplicates,
+    get_position_base,
+    placekey_index,
+    upgrade_delta_index,
+    write_delta_index,
+)
+from .writers import get_shard_file_names, pipelined_writer, shard_writer, write_shard_manifest
+from .sorting import sort_output_files
+from .loader import finish_loading, record_loader, senzing_engine
+from .monitor import get_peak_rss_mb, get_range_sizes, progress_fields, run_monitor, run_state, stage_profiler
+
+# --the run_state of a worker process, set by init_worker()
+worker_state = None
+
+
+# ----------------------------------------
+def read_checkpoint(checkpoint_file):
+    if not os.path.exists(checkpoint_file):
+        return None
+    with open(checkpoint_file, "r") as infile:
+        return json.load(infile)
+
+
+# ----------------------------------------
+def write_checkpoint(checkpoint_file, checkpoint):
+    # --replaced in one step so there is always a complete checkpoint on disk
+    with open(checkpoint_file + ".tmp", "w") as outfile:
+        json.dump(checkpoint, outfile)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(checkpoint_file + ".tmp", checkpoint_file)
+
+
+# ----------------------------------------
+def init_worker(shutdown_event, progress_counts):
+    # --the pool runs this in each worker process, the file ranges it then maps use the
+    # --run_state it leaves in worker_state
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    global worker_state
+    worker_state = run_state(progress_counts, shutdown_event, in_worker=True)
+
+
+# ----------------------------------------
+def map_file_range(args, header, start_offset, end_offset, output_file, part_num=0, state=None):
+
+    state = state or worker_state
+
+    sg_mapper = mapper(args.stats_mode)
+    sg_mapper.stat_example_size = args.max_example_size
+    serialize = get_serializer(args.serializer)
+    input_row_count = 0
+    output_row_count = 0
+    output_byte_count = 0
+    input_offset = start_offset
+    output_offset = None
+
+    # --checkpoints record how far this file range got so a later run can resume it
+    checkpoint_file = "%s.checkpoint" % output_file
+    checkpoint_rows = args.checkpoint_interval
+    checkpoint = {
+        "input_file": args.input_file,
+        "start_offset": start_offset,
+        "end_offset": end_offset,
+        "complete": False,
+    }
+    last_checkpoint = read_checkpoint(checkpoint_file) if args.resume else None
+    if last_checkpoint:
+        if any(last_checkpoint[x] != checkpoint[x] for x in checkpoint if x != "complete"):
+            raise ValueError(
+                "%s is for a different input file or file range, resume with the same input file and number of workers"
+                % checkpoint_file
+            )
+        input_row_count = last_checkpoint["input_row_count"]
+        output_row_count = last_checkpoint["output_row_count"]
+        sg_mapper.merge_stat_pack(last_checkpoint["stat_pack"])
+        if last_checkpoint["complete"]:
+            return input_row_count, output_row_count, sg_mapper.stat_pack, None, None
+        input_offset = last_checkpoint["input_offset"]
+        output_offset = output_byte_count = last_checkpoint["output_offset"]
+        print("resuming %s after row %s" % (output_file, input_row_count))
+
+    if args.drop_absent_parents:
+        sg_mapper.placekey_index = placekey_index(args.parent_index)
+    input_file_handle = open_input_file(args.input_file)
+    seek_input_file(input_file_handle, input_offset)
+    loader = None
+    shards = None
+    if args.load_senzing:
+        engine = senzing_engine(args.senzing_settings)
+        loader = record_loader(
+            engine.add_record,
+            args.load_threads,
+            args.load_batch_size,
+            args.load_queue_size,
+            engine.retry_errors,
+        )
+        output_file_handle = open(os.devnull, "wb")
+    elif args.shard_count:
+        shards = shard_writer(
+            [open_output_file(shard_file) for shard_file in get_shard_file_names(output_file, args.shard_count)]
+        )
+        output_file_handle = shards
+    else:
+        output_file_handle = open_output_file(output_file, output_offset)
+    if args.pipeline:
+        output_file_handle = pipelined_writer(output_file_handle, args.queue_size)
+    delta = None
+    if args.delta_index:
+        delta = delta_index(args.delta_index, os.path.join(args.delta_run_dir, "part%03d" % part_num))
+    duplicates = None
+    if args.duplicates:
+        duplicates = duplicate_index(args.duplicate_index, args.duplicates)
+
+    profiler = stage_profiler(args.profile_interval) if args.profile else None
+    output_lines = []
+    column_indexes = get_column_indexes(header, sg_mapper.mapped_columns)
+    if args.reader == "mmap":
+        input_reader = mmap_reader(
+            input_file_handle,
+            column_indexes,
+            input_offset,
+            end_offset,
+            skip_column_indexes=get_large_column_indexes(header, column_indexes),
+            max_field_size=args.max_field_size,
+        )
+        input_rows = input_reader
+    else:
+        if args.pipeline:
+            input_reader = pipelined_line_reader(
+                input_file_handle,
+                input_offset,
+                end_offset,
+                queue_size=args.queue_size,
+            )
+        else:
+            input_reader = line_reader(input_file_handle, input_offset, end_offset)
+        if args.reader == "projected":
+            input_reader = input_rows = projected_reader(
+                input_reader,
+                column_indexes,
+                skip_column_indexes=get_large_column_indexes(header, column_indexes),
+                max_field_size=args.max_field_size,
+            )
+        else:
+            input_rows = projected_csv_reader(input_reader, len(header), column_indexes, args.max_field_size)
+    completed = True
+    for input_row in input_rows:
+        input_row_count += 1
+        if sg_mapper.profiler:
+            profiler.mark("parse")
+
+        json_data = sg_mapper.map_row(input_row, input_row_count)
+        if json_data and duplicates:
+            json_data = duplicates.check_record(sg_mapper, json_data, args.position_base + input_reader.offset)
+        if json_data and delta:
+            delta_status = delta.check_record(
+                json_data["RECORD_ID"],
+                int(sg_mapper.compute_record_hash(json_data)[:16], 16),
+            )
+            sg_mapper.update_stat("!INFO", "DELTA_" + delta_status)
+            if delta_status == "UNCHANGED":
+                json_data = None
+            if sg_mapper.profiler:
+                profiler.mark("delta")
+        if json_data:
+            if loader:
+                loader.add(
+                    json_data["DATA_SOURCE"],
+                    json_data.get("RECORD_ID", ""),
+                    serialize(json_data).decode("utf-8"),
+                )
+            else:
+                if shards:
+                    shards.route(json_data.get("RECORD_ID", ""))
+                output_line = serialize(json_data)
+                output_byte_count += len(output_line)
+                output_lines.append(output_line)
+            output_row_count += 1
+            if args.check_serializer and not serializers_match(json_data):
+                sg_mapper.update_stat("!INFO", "SERIALIZER_MISMATCH", json_data["RECORD_ID"])
+        if sg_mapper.profiler:
+            profiler.mark("serialize")
+            profiler.end_row()
+            sg_mapper.profiler = None
+
+        if input_row_count % 1000 == 0:
+            if profiler:
+                write_start_time = time.perf_counter()
+                output_file_handle.write(b"".join(output_lines))
+                profiler.add_time("write", time.perf_counter() - write_start_time)
+                if not state.in_worker:
+                    profiler.record_progress(input_row_count)
+            else:
+                output_file_handle.write(b"".join(output_lines))
+            output_lines = []
+            state.set_progress(
+                part_num,
+                input_row_count,
+                output_row_count,
+                input_reader.offset - start_offset,
+                output_byte_count,
+                1,
+            )
+            if not state.in_worker:
+                print(
+                    "%s rows processed, %s rows written%s"
+                    % (
+                        input_row_count,
+                        output_row_count,
+                        (get_pipeline_status(input_reader, output_file_handle) if args.pipeline else ""),
+                    )
+                )
+        if checkpoint_rows and input_row_count % checkpoint_rows == 0:
+            output_file_handle.write(b"".join(output_lines))
+            output_lines = []
+            checkpoint["input_offset"] = input_reader.offset
+            checkpoint["output_offset"] = sync_output_file(output_file_handle)
+            checkpoint["input_row_count"] = input_row_count
+            checkpoint["output_row_count"] = output_row_count
+            checkpoint["stat_pack"] = sg_mapper.stat_pack
+            write_checkpoint(checkpoint_file, checkpoint)
+        if state.is_shut_down():
+            completed = False
+            break
+
+        # --the next row is timed from here, so its parse time is included
+        if profiler and input_row_count % profiler.sample_interval == 0:
+            sg_mapper.profiler = profiler
+            profiler.start_row()
+
+    write_start_time = time.perf_counter()
+    output_file_handle.write(b"".join(output_lines))
+    if profiler:
+        profiler.add_time("write", time.perf_counter() - write_start_time)
+    if checkpoint_rows or args.resume:
+        checkpoint["input_offset"] = input_reader.offset
+        checkpoint["output_offset"] = sync_output_file(output_file_handle)
+        checkpoint["input_row_count"] = input_row_count
+        checkpoint["output_row_count"] = output_row_count
+        checkpoint["stat_pack"] = sg_mapper.stat_pack
+        checkpoint["complete"] = completed
+        write_checkpoint(checkpoint_file, checkpoint)
+    if args.pipeline:
+        if state.in_worker:
+            print("file range %s%s" % (part_num + 1, get_pipeline_status(input_reader, output_file_handle)))
+        input_reader.close()
+    if args.reader == "mmap":
+        input_reader.close()
+    output_file_handle.close()
+    input_file_handle.close()
+    if delta:
+        delta.close()
+    if duplicates:
+        duplicates.close()
+    if sg_mapper.placekey_index:
+        sg_mapper.placekey_index.close()
+    if loader:
+        finish_loading(loader, engine, sg_mapper)
+    state.set_progress(
+        part_num,
+        input_row_count,
+        output_row_count,
+        input_reader.offset - start_offset,
+        output_byte_count,
+        2,
+    )
+
+    return (
+        input_row_count,
+        output_row_count,
+        sg_mapper.stat_pack,
+        profiler.get_profile() if profiler else None,
+        shards.row_counts if shards else None,
+    )
+
+
+# ----------------------------------------
+def map_columnar_range(args, header, start_unit, end_unit, output_file, part_num=0, state=None):
+
+    state = state or worker_state
+
+    # --parquet and arrow files are mapped a record batch at a time, the units are
+    # --row groups or record batches so a range is never split within one
+    import_pyarrow()
+    sg_mapper = mapper(args.stats_mode)
+    sg_mapper.stat_example_size = args.max_example_size
+    input_row_count = 0
+    output_row_count = 0
+    output_byte_count = 0
+    get_column_indexes(header, sg_mapper.mapped_columns)
+    if args.drop_absent_parents:
+        sg_mapper.placekey_index = placekey_index(args.parent_index)
+    duplicates = None
+    if args.duplicates:
+        duplicates = duplicate_index(args.duplicate_index, args.duplicates)
+        row_number = args.position_base + sum(get_columnar_row_counts(args.input_file)[:start_unit])
+
+    # --every batch is timed when profiling, there are few enough of them
+    profiler = stage_profiler(1) if args.profile else None
+    loader = None
+    shards = None
+    if args.load_senzing:
+        engine = senzing_engine(args.senzing_settings)
+        loader = record_loader(
+            engine.add_record,
+            args.load_threads,
+            args.load_batch_size,
+            args.load_queue_size,
+            engine.retry_errors,
+        )
+        output_file_handle = open(os.devnull, "wb")
+    elif args.shard_count:
+        shards = shard_writer(
+            [open_output_file(shard_file) for shard_file in get_shard_file_names(output_file, args.shard_count)]
+        )
+        output_file_handle = shards
+    else:
+        output_file_handle = open_output_file(output_file)
+    if profiler:
+        profiler.start_row()
+    for record_batch in read_columnar_batches(
+        args.input_file,
+        sg_mapper.mapped_columns,
+        start_unit,
+        end_unit,
+        args.batch_size,
+    ):
+        if not record_batch.num_rows:
+            continue
+        if profiler:
+            profiler.mark("parse")
+        mapped_columns = sg_mapper.map_record_batch(record_batch)
+        if duplicates:
+            mapped_columns = check_duplicate_columns(sg_mapper, duplicates, mapped_columns, row_number)
+            row_number += record_batch.num_rows
+        if profiler:
+            profiler.mark("map_record_batch")
+        batch_lines = json_lines_from_columns(mapped_columns)
+        if profiler:
+            profiler.mark("serialize")
+        if loader:
+            # --RECORD_ID is the second mapped column
+            for record_id, record_json in zip(
+                mapped_columns[1][1].to_pylist(),
+                batch_lines.decode("utf-8").split("\n"),
+            ):
+                loader.add("SAFEGRAPH", record_id or "", record_json)
+        else:
+            if shards:
+                for record_id in mapped_columns[1][1].to_pylist():
+                    shards.route(record_id or "")
+            output_file_handle.write(batch_lines)
+        input_row_count += record_batch.num_rows
+        output_byte_count += len(batch_lines)
+        output_row_count += len(mapped_columns[0][1])
+        if profiler:
+            profiler.mark("write")
+            profiler.end_row()
+            if not state.in_worker:
+                profiler.record_progress(input_row_count)
+
+        state.set_progress(
+            part_num,
+            input_row_count,
+            output_row_count,
+            input_row_count,
+            output_byte_count,
+            1,
+        )
+        if not state.in_worker:
+            print("%s rows processed, %s rows written" % (input_row_count, output_row_count))
+        if state.is_shut_down():
+            break
+        if profiler:
+            profiler.start_row()
+
+    output_file_handle.close()
+    if duplicates:
+        duplicates.close()
+    if sg_mapper.placekey_index:
+        sg_mapper.placekey_index.close()
+    if loader:
+        finish_loading(loader, engine, sg_mapper)
+    state.set_progress(
+        part_num,
+        input_row_count,
+        output_row_count,
+        input_row_count,
+        output_byte_count,
+        2,
+    )
+
+    return (
+        input_row_count,
+        output_row_count,
+        sg_mapper.stat_pack,
+        profiler.get_profile() if profiler else None,
+        shards.row_counts if shards else None,
+    )
+
+
+# ----------------------------------------
+def check_duplicate_columns(sg_mapper, duplicates, mapped_columns, row_number):
+    # --duplicate_index.check_record() for a batch, RECORD_ID is the second column and
+    # --each row's position is its row number in the file
+    pyarrow = import_pyarrow()
+    record_ids = mapped_columns[1][1].to_pylist()
+    new_record_ids = []
+    for position, record_id in enumerate(record_ids, row_number):
+        json_data = duplicates.check_record(sg_mapper, {"RECORD_ID": record_id}, position)
+        new_record_ids.append(json_data["RECORD_ID"] if json_data else False)
+    if new_record_ids == record_ids:
+        return mapped_columns
+    keep_mask = pyarrow.array([x is not False for x in new_record_ids])
+    mapped_columns[1] = (
+        mapped_columns[1][0],
+        pyarrow.array([x if x is not False else None for x in new_record_ids], pyarrow.string()),
+    )
+    return [(attribute, pyarrow.compute.filter(column, keep_mask)) for attribute, column in mapped_columns]
+
+
+# ----------------------------------------
+def get_pipeline_status(input_reader, output_file_handle):
+    return ", %s, %s" % (input_reader.get_status(), output_file_handle.get_status())
+
+
+# ----------------------------------------
+def run(args):
+    # --maps the input files for the arguments cli.main() checked, errors are printed
+    # --and exit with 1
+    proc_start_time = time.time()
+    state = run_state()
+
+    def signal_handler(signal_num, frame):
+        print("USER INTERRUPT! Shutting down ... (please wait)")
+        state.request_shutdown()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    columnar_input = any(get_columnar_ext(x) for x in args.input_files)
+    if args.delta_index:
+        if os.path.exists(args.delta_index) and upgrade_delta_index(args.delta_index):
+            print("%s upgraded to the current delta index layout" % args.delta_index)
+        args.delta_run_dir = tempfile.mkdtemp(prefix="safegraph-delta-", dir=args.temp_dir)
+
+    # --read the headers and find where the data starts
+    stat_mapper = mapper()
+    input_headers = []
+    for input_file in args.input_files:
+        try:
+            header, data_offset = read_input_header(input_file)
+            get_column_indexes(header, stat_mapper.mapped_columns)
+        except ValueError as err:
+            print("\n%s is not a SafeGraph places file, %s\n" % (input_file, err))
+            sys.exit(1)
+        input_headers.append((header, data_offset))
+    header, data_offset = input_headers[0]
+    map_range = map_columnar_range if columnar_input else map_file_range
+
+    # --the data limit covers the heap but not memory mapped files or thread stacks,
+    # --worker processes inherit it so each one gets the same limit
+    if args.memory_limit:
+        try:
+            resource.setrlimit(
+                resource.RLIMIT_DATA,
+                (
+                    args.memory_limit * 1048576,
+                    resource.getrlimit(resource.RLIMIT_DATA)[1],
+                ),
+            )
+        except ValueError as err:
+            print("\nThe --memory_limit could not be set, %s\n" % err)
+            sys.exit(1)
+
+    # --progress for schedulers, sampled from the mapping processes on a thread
+    monitor = None
+    if args.status_file or args.metrics_port:
+        try:
+            monitor = run_monitor(args.workers, args.status_file, args.metrics_port, args.status_interval)
+        except OSError as err:
+            print("\nThe metrics port %s could not be opened, %s\n" % (args.metrics_port, err))
+            sys.exit(1)
+
+    # --a first pass finds the record ids that occur more than once
+    args.duplicate_index = None
+    if args.duplicates:
+        if monitor:
+            monitor.phase = "duplicates"
+        duplicate_dir = tempfile.mkdtemp(prefix="safegraph-duplicates-", dir=args.temp_dir)
+        print("checking for duplicate record ids ...")
+        try:
+            args.duplicate_index, duplicate_report = find_duplicates(args, duplicate_dir, state=state)
+        except MemoryError:
+            print("\nOut of memory within the --memory_limit of %s MB\n" % args.memory_limit)
+            sys.exit(1)
+        if state.is_shut_down():
+            shutil.rmtree(duplicate_dir)
+            print("\nDuplicate check aborted\n")
+            sys.exit(1)
+        print(
+            "%s records, %s duplicates of %s record ids"
+            % (
+                duplicate_report["records"],
+                duplicate_report["duplicate_records"],
+                duplicate_report["duplicated_record_ids"],
+            )
+        )
+        stat_mapper.get_stat_entry("!INFO", "DUPLICATED_RECORD_IDS")[0]["count"] += duplicate_report[
+            "duplicated_record_ids"
+        ]
+
+    # --a first pass indexes every PLACEKEY so parent pointers can be checked against it
+    args.parent_index = None
+    if args.parent_check or args.drop_absent_parents:
+        if monitor:
+            monitor.phase = "parents"
+        parent_index_dir = tempfile.mkdtemp(prefix="safegraph-parents-", dir=args.temp_dir)
+        print("indexing placekeys ...")
+        try:
+            args.parent_index, parent_report = build_parent_index(args, parent_index_dir, state=state)
+        except MemoryError:
+            print("\nOut of memory within the --memory_limit of %s MB\n" % args.memory_limit)
+            sys.exit(1)
+        if state.is_shut_down():
+            shutil.rmtree(parent_index_dir)
+            print("\nPlacekey indexing aborted\n")
+            sys.exit(1)
+        print(
+            "%s places, %s parent pointers, %s of them to %s parents not in the file"
+            % (
+                parent_report["places"],
+                parent_report["parent_pointers"],
+                parent_report["dangling_pointers"],
+                parent_report["dangling_parents"],
+            )
+        )
+        stat_mapper.get_stat_entry("!INFO", "PARENT_DANGLING")[0]["count"] += parent_report["dangling_pointers"]
+
+    # --sorted output is mapped to temporary files first and then sorted into place,
+    # --any shards are cut from the sorted records rather than by RECORD_ID hash, with
+    # --checkpoints they go next to the output file so a later run can resume them
+    mapped_file = args.output_file
+    if args.sort_output:
+        if args.checkpoint_interval or args.resume:
+            compression_ext = get_compression_ext(args.output_file)
+            sort_dir = os.path.splitext(args.output_file[: -len(compression_ext) or None])[0] + "-sort"
+            os.makedirs(sort_dir, exist_ok=True)
+        else:
+            sort_dir = tempfile.mkdtemp(prefix="safegraph-sort-", dir=args.temp_dir)
+        mapped_file = os.path.join(sort_dir, "mapped.json")
+        sort_shard_count, args.shard_count = args.shard_count, 0
+
+    input_row_count = 0
+    output_row_count = 0
+    run_profiler = stage_profiler(args.profile_interval) if args.profile else None
+
+    if args.workers > 1 and len(args.input_files) == 1 and get_compression_ext(args.input_file):
+        print("\nCompressed input files cannot be split, mapping with 1 worker\n")
+        args.workers = 1
+
+    if args.workers == 1 and len(args.input_files) == 1:
+        output_files = [mapped_file] if mapped_file else []
+        progress_counts = multiprocessing.Array("q", progress_fields, lock=False)
+        state.progress_counts = progress_counts
+        if monitor:
+            monitor.watch(
+                progress_counts,
+                get_range_sizes(args.input_file, [(data_offset, None)]),
+                1,
+            )
+        try:
+            input_row_count, output_row_count, stat_pack, profile, shard_rows = map_range(
+                args, header, data_offset, None, mapped_file, state=state
+            )
+        except ValueError as err:
+            print("\n%s\n" % err)
+            sys.exit(1)
+        except MemoryError:
+            print("\nOut of memory within the --memory_limit of %s MB\n" % args.memory_limit)
+            sys.exit(1)
+        stat_mapper.merge_stat_pack(stat_pack)
+        if run_profiler and profile:
+            run_profiler.merge(profile)
+    else:
+        if len(args.input_files) > 1:
+            # --each file is mapped whole by one worker, the largest files are queued
+            # --first so a big one does not start last and hold up the run
+            file_ranges = []
+            for file_num, input_file in enumerate(args.input_files):
+                file_args = copy.copy(args)
+                file_args.input_file = input_file
+                file_args.position_base = get_position_base(file_num)
+                if args.reader == "mmap" and get_compression_ext(input_file):
+                    file_args.reader = "projected"
+                file_ranges.append(
+                    (
+                        (map_columnar_range if get_columnar_ext(input_file) else map_file_range),
+                        file_args,
+                        input_headers[file_num][0],
+                        input_headers[file_num][1],
+                        None,
+                    )
+                )
+            task_order = sorted(
+                range(len(file_ranges)),
+                key=lambda x: -os.path.getsize(args.input_files[x]),
+            )
+            task_name = "files"
+        else:
+            if columnar_input:
+                split_points = find_columnar_split_points(args.input_file, args.workers)
+            else:
+                split_points = find_split_points(args.input_file, data_offset, args.workers)
+            split_points = sorted(set(split_points))
+            file_ranges = [
+                (map_range, args, header, start_offset, end_offset)
+                for start_offset, end_offset in zip(split_points[:-1], split_points[1:])
+            ]
+            task_order = range(len(file_ranges))
+            task_name = "file ranges"
+        if args.load_senzing:
+            part_files = [None] * len(file_ranges)
+            output_files = []
+        else:
+            part_files = [get_part_file_name(mapped_file, part_num + 1) for part_num in range(len(file_ranges))]
+            output_files = part_files
+        print("mapping %s %s with %s workers" % (len(file_ranges), task_name, args.workers))
+
+        shard_rows = [0] * args.shard_count
+        shutdown_event = multiprocessing.Event()
+        progress_counts = multiprocessing.Array("q", len(file_ranges) * progress_fields, lock=False)
+        state.shutdown_event = shutdown_event
+        if monitor:
+            monitor.watch(
+                progress_counts,
+                [
+                    get_range_sizes(range_args.input_file, [(start_offset, end_offset)])[0]
+                    for _, range_args, _, start_offset, end_offset in file_ranges
+                ],
+                args.workers,
+            )
+        with multiprocessing.Pool(
+            args.workers,
+            initializer=init_worker,
+            initargs=(shutdown_event, progress_counts),
+        ) as pool:
+            pending_results = [None] * len(file_ranges)
+            for part_num in task_order:
+                range_mapper, range_args, range_header, start_offset, end_offset = file_ranges[part_num]
+                pending_results[part_num] = pool.apply_async(
+                    range_mapper,
+                    (
+                        range_args,
+                        range_header,
+                        start_offset,
+                        end_offset,
+                        part_files[part_num],
+                        part_num,
+                    ),
+                )
+            last_progress = None
+            for result in pending_results:
+                while not result.ready():
+                    result.wait(1)
+                    progress = (
+                        sum(progress_counts[0::progress_fields]),
+                        sum(progress_counts[1::progress_fields]),
+                    )
+                    if progress != last_progress:
+                        print("%s rows processed, %s rows written" % progress)
+                        last_progress = progress
+                    if run_profiler:
+                        run_profiler.record_progress(progress[0])
+            for part_num, result in enumerate(pending_results):
+                try:
+                    (
+                        part_input_count,
+                        part_output_count,
+                        stat_pack,
+                        profile,
+                        part_shard_rows,
+                    ) = result.get()
+                except ValueError as err:
+                    print("\n%s\n" % err)
+                    sys.exit(1)
+                except MemoryError:
+                    print("\nOut of memory within the --memory_limit of %s MB\n" % args.memory_limit)
+                    sys.exit(1)
+                input_row_count += part_input_count
+                output_row_count += part_output_count
+                if len(args.input_files) > 1:
+                    print(
+                        "%s: %s rows processed, %s rows written"
+                        % (
+                            args.input_files[part_num],
+                            part_input_count,
+                            part_output_count,
+                        )
+                    )
+                    stat_mapper.update_stat("!INFO", "INPUT_FILES", args.input_files[part_num])
+                if part_shard_rows:
+                    shard_rows = [x + y for x, y in zip(shard_rows, part_shard_rows)]
+                stat_mapper.merge_stat_pack(stat_pack)
+                if run_profiler and profile:
+                    run_profiler.merge(profile)
+
+        if args.load_senzing or args.sort_output:
+            pass
+        elif args.shard_count:
+            # --each worker wrote its own part of every shard
+            shard_parts = [get_shard_file_names(part_file, args.shard_count) for part_file in part_files]
+            for shard_num, shard_file in enumerate(get_shard_file_names(args.output_file, args.shard_count)):
+                with open(shard_file, "wb") as output_file_handle:
+                    for part_shard_files in shard_parts:
+                        with open(part_shard_files[shard_num], "rb") as part_file_handle:
+                            shutil.copyfileobj(part_file_handle, output_file_handle)
+                        os.remove(part_shard_files[shard_num])
+        elif state.is_shut_down() and (args.checkpoint_interval or args.resume):
+            print("output left in %s part files for --resume" % len(part_files))
+        elif args.worker_output == "ordered":
+            with open(args.output_file, "wb") as output_file_handle:
+                for part_file in part_files:
+                    with open(part_file, "rb") as part_file_handle:
+                        shutil.copyfileobj(part_file_handle, output_file_handle)
+                    os.remove(part_file)
+        else:
+            print("output written to %s files like %s" % (len(part_files), part_files[0]))
+
+    if args.sort_output:
+        args.shard_count = sort_shard_count
+        if not state.is_shut_down():
+            print("sorting the output by %s ..." % args.sort_output)
+            if monitor:
+                monitor.phase = "sorting"
+            shard_rows = sort_output_files(
+                output_files,
+                (get_shard_file_names(args.output_file, args.shard_count) if args.shard_count else [args.output_file]),
+                args,
+                sort_dir,
+            )
+            shutil.rmtree(sort_dir)
+        elif args.checkpoint_interval or args.resume:
+            print("output not sorted for an aborted run, the mapped records are left in %s for --resume" % sort_dir)
+            args.shard_count = 0
+        else:
+            print("output not sorted for an aborted run")
+            args.shard_count = 0
+            shutil.rmtree(sort_dir)
+
+    # --replace the delta index with this run's and write the deletes
+    if args.delta_index:
+        if not state.is_shut_down():
+            index_count, delete_count = write_delta_index(
+                args.delta_index,
+                sorted(glob.glob(os.path.join(args.delta_run_dir, "part*"))),
+                args.delete_file,
+                get_serializer(args.serializer),
+            )
+            stat_mapper.get_stat_entry("!INFO", "DELTA_DELETED")[0]["count"] += delete_count
+            print("%s records indexed, %s deletes written to %s" % (index_count, delete_count, args.delete_file))
+        else:
+            print("delta index not updated for an aborted run")
+        shutil.rmtree(args.delta_run_dir)
+
+    if args.parent_index:
+        shutil.rmtree(parent_index_dir)
+    if args.duplicate_index:
+        shutil.rmtree(duplicate_dir)
+
+    # --each shard gets a manifest so loaders can check the file they pick up
+    if args.shard_count:
+        for shard_file, row_count in zip(get_shard_file_names(args.output_file, args.shard_count), shard_rows):
+            write_shard_manifest(shard_file, row_count)
+        print("output written to %s shards like %s" % (args.shard_count, get_shard_file_names(args.output_file, 1)[0]))
+
+    # --checkpoints are only needed until the run completes
+    if not state.is_shut_down():
+        for output_file in output_files:
+            if os.path.exists(output_file + ".checkpoint"):
+                os.remove(output_file + ".checkpoint")
+
+    elapsed_mins = round((time.time() - proc_start_time) / 60, 1)
+    run_status = ("completed in" if not state.is_shut_down() else "aborted after") + " %s minutes" % elapsed_mins
+    print("%s rows processed, %s rows written, %s\n" % (input_row_count, output_row_count, run_status))
+    if resource:
+        print(
+            "peak memory %s MB%s\n"
+            % (
+                get_peak_rss_mb(resource.RUSAGE_SELF),
+                (
+                    ", %s MB for the largest worker" % get_peak_rss_mb(resource.RUSAGE_CHILDREN)
+                    if args.workers > 1 or len(args.input_files) > 1
+                    else ""
+                ),
+            )
+        )
+
+    if args.check_serializer:
+        mismatch_count = stat_mapper.stat_pack.get("!INFO", {}).get("SERIALIZER_MISMATCH", {}).get("count", 0)
+        print("%s records serialized differently by orjson\n" % mismatch_count)
+
+    if monitor:
+        monitor.close("completed" if not state.is_shut_down() else "aborted")
+        if args.status_file:
+            print("Final status written to %s\n" % args.status_file)
+
+    # --write statistics file
+    if args.log_file:
+        with open(args.log_file, "w") as outfile:
+            json.dump(stat_mapper.stat_pack, outfile, indent=4, sort_keys=True)
+        print("Mapping stats written to %s\n" % args.log_file)
+
+    # --the profile report goes next to the statistics file, output file or input file
+    if run_profiler:
+        profile_file = get_report_file_name(args.log_file or args.output_file or args.input_file, "-profile")
+        with open(profile_file, "w") as outfile:
+            json.dump(run_profiler.get_report(input_row_count), outfile, indent=4)
+        print("Profile report written to %s\n" % profile_file)
+
+    # --the parent report goes next to the statistics file, output file or input file
+    if args.parent_index:
+        parent_file = get_report_file_name(args.log_file or args.output_file or args.input_file, "-parents")
+        with open(parent_file, "w") as outfile:
+            json.dump(parent_report, outfile, indent=4)
+        print("Parent report written to %s\n" % parent_file)
+
+    # --the run report goes next to the statistics file for schedulers to pick up
+    if args.log_file:
+        elapsed_seconds = time.time() - proc_start_time
+        run_report = {
+            "status": "completed" if not state.is_shut_down() else "aborted",
+            "started": datetime.fromtimestamp(proc_start_time).isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_seconds": round(elapsed_seconds, 1),
+            "input_files": args.input_files,
+            "input_bytes": sum(os.path.getsize(x) for x in args.input_files),
+            "output_file": args.output_file,
+            "shard_count": args.shard_count,
+            "rows_read": input_row_count,
+            "rows_written": output_row_count,
+            "bytes_written": sum(progress_counts[3::progress_fields]),
+            "rows_per_sec": round(input_row_count / max(elapsed_seconds, 0.001)),
+            "workers": args.workers,
+            "peak_memory_mb": (get_peak_rss_mb(resource.RUSAGE_SELF) if resource else None),
+            "peak_worker_memory_mb": (
+                get_peak_rss_mb(resource.RUSAGE_CHILDREN)
+                if resource and (args.workers > 1 or len(args.input_files) > 1)
+                else None
+            ),
+            "stats_file": args.log_file,
+        }
+        run_file = get_report_file_name(args.log_file, "-run")
+        with open(run_file, "w") as outfile:
+            json.dump(run_report, outfile, indent=4)
+        print("Run report written to %s\n" % run_file)
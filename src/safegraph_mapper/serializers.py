@@ -0,0 +1,89 @@
+# --the json serializers, orjson when it is installed and the json module otherwise, both writing
+# --the same bytes, and a columnar one for arrow record batches
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .files import import_pyarrow
+
+
+# ----------------------------------------
+def json_dumps_line(json_data, sort_keys=False):
+    # --formatted the same way as orjson so either serializer writes the same bytes
+    return (json.dumps(json_data, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys) + "\n").encode(
+        "utf-8"
+    )
+
+
+# ----------------------------------------
+def orjson_dumps_line(json_data, sort_keys=False):
+    option = orjson.OPT_APPEND_NEWLINE
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(json_data, option=option)
+
+
+# ----------------------------------------
+def get_serializer(serializer_name):
+    if serializer_name == "orjson" or (serializer_name == "auto" and orjson):
+        if not orjson:
+            raise ValueError("the orjson package is required for --serializer orjson")
+        return orjson_dumps_line
+    return json_dumps_line
+
+
+# ----------------------------------------
+def serializers_match(json_data):
+    # --orjson output must match the standard library's byte for byte, ignoring key order
+    if not orjson:
+        return True
+    return orjson_dumps_line(json_data, sort_keys=True) == json_dumps_line(json_data, sort_keys=True)
+
+
+# ----------------------------------------
+def escape_json_column(column):
+    # --the same escapes the serializers use, control characters other than the
+    # --whitespace ones clean_column() already replaced are rare so only looked for
+    pyarrow = import_pyarrow()
+    compute = pyarrow.compute
+    column = compute.replace_substring(column, "\\", "\\\\")
+    column = compute.replace_substring(column, '"', '\\"')
+    if compute.any(compute.match_substring_regex(column, "[\\x00-\\x1f]")).as_py():
+        for char_code in range(32):
+            column = compute.replace_substring(
+                column,
+                chr(char_code),
+                json.dumps(chr(char_code))[1:-1],
+            )
+    return column
+
+
+# ----------------------------------------
+def json_lines_from_columns(mapped_columns):
+    # --builds the json lines for a whole batch with arrow string functions, null
+    # --values are left out just like build_record() does
+    pyarrow = import_pyarrow()
+    compute = pyarrow.compute
+    fragments = []
+    for attribute, column in mapped_columns:
+        fragments.append(
+            compute.fill_null(
+                compute.binary_join_element_wise(
+                    '%s"%s":"' % ("," if fragments else "", attribute),
+                    escape_json_column(column),
+                    '"',
+                    "",
+                ),
+                "",
+            )
+        )
+    json_lines = compute.binary_join_element_wise("{", *fragments, "}\n", "")
+    batch_text = compute.binary_join(
+        pyarrow.ListArray.from_arrays(pyarrow.array([0, len(json_lines)], pyarrow.int32()), json_lines),
+        "",
+    )
+    return compute.cast(batch_text, pyarrow.binary())[0].as_buffer().to_pybytes()
@@ -0,0 +1,160 @@
+# ----sort_output, the mapped records are sorted by placekey cell or geohash in runs that are then
+# --merged
+
+import os
+import operator
+import re
+import heapq
+
+from .files import io_buffer_size, open_input_file, open_output_file
+
+geohash_chars = "0123456789bcdefghjkmnpqrstuvwxyz"
+placekey_pattern = re.compile(rb'"PLACEKEY":"([^"]*)"')
+latitude_pattern = re.compile(rb'"BUSINESS_GEO_LATITUDE":"([^"]*)"')
+longitude_pattern = re.compile(rb'"BUSINESS_GEO_LONGITUDE":"([^"]*)"')
+
+
+# ----------------------------------------
+def get_geohash(latitude, longitude, precision=5):
+    # --longitude and latitude bits interleaved, longitude first, 5 to a character
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        raise ValueError("coordinates out of range")
+    value_ranges = [[-180.0, 180.0], [-90.0, 90.0]]
+    values = [longitude, latitude]
+    geohash = []
+    char_value = 0
+    for bit_num in range(precision * 5):
+        value_range = value_ranges[bit_num % 2]
+        middle = (value_range[0] + value_range[1]) / 2
+        char_value <<= 1
+        if values[bit_num % 2] >= middle:
+            char_value |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        if bit_num % 5 == 4:
+            geohash.append(geohash_chars[char_value])
+            char_value = 0
+    return "".join(geohash)
+
+
+# ----------------------------------------
+def get_sort_key(json_line, sort_by, geohash_precision):
+    # --the where part of a PLACEKEY encodes its H3 cell, placekey and geohash
+    # --characters are both in ascending order so sorting the strings keeps nearby
+    # --places together, records without a location sort last
+    if sort_by == "placekey":
+        placekey_matched = placekey_pattern.search(json_line)
+        if placekey_matched and b"@" in placekey_matched.group(1):
+            return placekey_matched.group(1).split(b"@", 1)[1][:11]
+        return b"~"
+    latitude_matched = latitude_pattern.search(json_line)
+    longitude_matched = longitude_pattern.search(json_line)
+    try:
+        return get_geohash(
+            float(latitude_matched.group(1)),
+            float(longitude_matched.group(1)),
+            geohash_precision,
+        ).encode()
+    except (AttributeError, ValueError):
+        return b"~"
+
+
+# ----------------------------------------
+def write_sort_run(run_file, entries):
+    # --a stable sort, records with the same key stay in input order
+    entries.sort(key=operator.itemgetter(0))
+    with open(run_file, "wb", buffering=io_buffer_size) as outfile:
+        outfile.writelines(sort_key + b"\t" + json_line for sort_key, json_line in entries)
+    return run_file
+
+
+# ----------------------------------------
+def read_sort_run(run_file):
+    with open(run_file, "rb", buffering=io_buffer_size) as infile:
+        for run_line in infile:
+            yield run_line.split(b"\t", 1)
+
+
+# ----------------------------------------
+def merge_sort_runs(run_files):
+    # --heapq.merge() takes the first run's record on equal keys so the order is stable
+    return heapq.merge(
+        *[read_sort_run(run_file) for run_file in run_files],
+        key=operator.itemgetter(0),
+    )
+
+
+# ----------------------------------------
+def sort_output_files(mapped_files, output_files, args, run_dir, merge_width=128):
+
+    # --first pass: the mapped records go to sorted runs of about --sort_memory MB,
+    # --each mapped file is removed once read so the temp space stays at one copy,
+    # --along with its checkpoint so a resume after this maps it again
+    run_files = []
+    entries = []
+    entry_bytes = 0
+    run_size = args.sort_memory * 1048576
+    record_count = 0
+    for mapped_file in mapped_files:
+        with open_input_file(mapped_file) as infile:
+            for json_line in infile:
+                entries.append(
+                    (
+                        get_sort_key(json_line, args.sort_output, args.geohash_precision),
+                        json_line,
+                    )
+                )
+                record_count += 1
+                # --about 100 bytes of tuple and bytes object overhead per record
+                entry_bytes += len(json_line) + 100
+                if entry_bytes >= run_size:
+                    run_files.append(write_sort_run(os.path.join(run_dir, "run%05d" % len(run_files)), entries))
+                    entries = []
+                    entry_bytes = 0
+        os.remove(mapped_file)
+        if os.path.exists(mapped_file + ".checkpoint"):
+            os.remove(mapped_file + ".checkpoint")
+    if entries:
+        run_files.append(write_sort_run(os.path.join(run_dir, "run%05d" % len(run_files)), entries))
+        entries = []
+
+    # --too many runs to open at once are merged into longer runs first, the merged
+    # --run takes the place of the ones it came from to keep equal keys in order
+    merge_count = 0
+    while len(run_files) > merge_width:
+        merged_file = os.path.join(run_dir, "merged%05d" % merge_count)
+        merge_count += 1
+        with open(merged_file, "wb", buffering=io_buffer_size) as outfile:
+            outfile.writelines(
+                sort_key + b"\t" + json_line for sort_key, json_line in merge_sort_runs(run_files[:merge_width])
+            )
+        for run_file in run_files[:merge_width]:
+            os.remove(run_file)
+        run_files = [merged_file] + run_files[merge_width:]
+
+    # --second pass: the merged runs are written in order, shards take consecutive
+    # --ranges of about the same size and only change files between keys so no cell
+    # --or geohash is split across two of them
+    output_rows = [0] * len(output_files)
+    output_num = 0
+    output_file_handle = open_output_file(output_files[0])
+    last_key = None
+    for sort_key, json_line in merge_sort_runs(run_files):
+        if (
+            output_num < len(output_files) - 1
+            and sort_key != last_key
+            and sum(output_rows) >= record_count * (output_num + 1) / len(output_files)
+        ):
+            output_file_handle.close()
+            output_num += 1
+            output_file_handle = open_output_file(output_files[output_num])
+        output_file_handle.write(json_line)
+        output_rows[output_num] += 1
+        last_key = sort_key
+    output_file_handle.close()
+    for output_file in output_files[output_num + 1 :]:
+        open_output_file(output_file).close()
+    for run_file in run_files:
+        os.remove(run_file)
+    return output_rows
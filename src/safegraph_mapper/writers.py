@@ -0,0 +1,152 @@
+# --the output writers, pipelined_writer writes on its own thread and shard_writer splits the
+# --records by RECORD_ID hash
+
+import os
+import json
+import time
+import hashlib
+import queue
+import collections
+import threading
+
+from .files import get_suffixed_file_name, io_buffer_size
+from .indexes import get_key_hash
+
+
+# =========================
+class pipelined_writer:
+
+    # ----------------------------------------
+    def __init__(self, file_handle, queue_size=8):
+
+        # --a writer thread takes the batches of output off a bounded queue, so writing
+        # --and compressing overlap with mapping, flush() waits for the queue to empty
+        self.file_handle = file_handle
+        self.write_queue = queue.Queue(queue_size)
+        self.write_error = None
+        self.stall_seconds = 0.0
+        self.thread = threading.Thread(target=self.write_batches, daemon=True)
+        self.thread.start()
+
+    # ----------------------------------------
+    def write_batches(self):
+        while True:
+            data = self.write_queue.get()
+            if data is not None and not self.write_error:
+                try:
+                    self.file_handle.write(data)
+                except Exception as err:
+                    self.write_error = err
+            self.write_queue.task_done()
+            if data is None:
+                break
+
+    # ----------------------------------------
+    def write(self, data):
+        if self.write_error:
+            raise self.write_error
+        if not data:
+            return
+        if self.write_queue.full():
+            stall_start_time = time.perf_counter()
+            self.write_queue.put(data)
+            self.stall_seconds += time.perf_counter() - stall_start_time
+        else:
+            self.write_queue.put(data)
+
+    # ----------------------------------------
+    def flush(self):
+        self.write_queue.join()
+        if self.write_error:
+            raise self.write_error
+        self.file_handle.flush()
+
+    # ----------------------------------------
+    def fileno(self):
+        return self.file_handle.fileno()
+
+    # ----------------------------------------
+    def tell(self):
+        return self.file_handle.tell()
+
+    # ----------------------------------------
+    def get_status(self):
+        return "write queue %s/%s, %ss waiting on writes" % (
+            self.write_queue.qsize(),
+            self.write_queue.maxsize,
+            round(self.stall_seconds, 1),
+        )
+
+    # ----------------------------------------
+    def close(self):
+        self.write_queue.put(None)
+        self.thread.join()
+        self.file_handle.close()
+        if self.write_error:
+            raise self.write_error
+
+
+# =========================
+class shard_writer:
+
+    # ----------------------------------------
+    def __init__(self, file_handles):
+
+        # --route() is called for each record in the order its line is written, so the
+        # --lines of a write are matched back up with the shards they were routed to
+        self.file_handles = file_handles
+        self.shard_nums = collections.deque()
+        self.row_counts = [0] * len(file_handles)
+
+    # ----------------------------------------
+    def route(self, record_id):
+        self.shard_nums.append(get_key_hash(record_id) % len(self.file_handles))
+
+    # ----------------------------------------
+    def write(self, data):
+        shard_lines = [[] for _ in self.file_handles]
+        next_shard_num = self.shard_nums.popleft
+        for line in data.split(b"\n")[:-1]:
+            shard_lines[next_shard_num()].append(line)
+        for shard_num, lines in enumerate(shard_lines):
+            if lines:
+                self.file_handles[shard_num].write(b"\n".join(lines) + b"\n")
+                self.row_counts[shard_num] += len(lines)
+
+    # ----------------------------------------
+    def flush(self):
+        for file_handle in self.file_handles:
+            file_handle.flush()
+
+    # ----------------------------------------
+    def close(self):
+        for file_handle in self.file_handles:
+            file_handle.close()
+
+
+# ----------------------------------------
+def get_shard_file_names(output_file, shard_count):
+    return [get_suffixed_file_name(output_file, "-shard-%03d" % (shard_num + 1)) for shard_num in range(shard_count)]
+
+
+# ----------------------------------------
+def write_shard_manifest(shard_file, row_count):
+    # --the checksum is of the file as written, compressed or not, and the manifest is
+    # --named so a <output>-shard-*.json glob only picks up the shards
+    file_hash = hashlib.sha256()
+    with open(shard_file, "rb") as infile:
+        for block in iter(lambda: infile.read(io_buffer_size), b""):
+            file_hash.update(block)
+    manifest_file = "%s.manifest" % shard_file
+    with open(manifest_file, "w") as outfile:
+        json.dump(
+            {
+                "file": os.path.basename(shard_file),
+                "rows": row_count,
+                "bytes": os.path.getsize(shard_file),
+                "sha256": file_hash.hexdigest(),
+            },
+            outfile,
+            indent=4,
+        )
+    return manifest_file
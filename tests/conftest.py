@@ -0,0 +1,58 @@
+import csv
+import os
+import sys
+
+import pytest
+
+# --the tests use the mapper through the safegraph_mapper package in src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from safegraph_mapper.mapping import mapper  # noqa: E402 pylint: disable=wrong-import-position
+
+
+# ----------------------------------------
+@pytest.fixture(name="write_places_file")
+def fixture_write_places_file():
+    # --the mapped columns with a POLYGON_WKT column part way in, like the real files,
+    # --the columns a row leaves out get a made up value
+    def write_places_file(file_name, rows):
+        header = list(mapper("off").mapped_columns)
+        header.insert(5, "POLYGON_WKT")
+        header.append("OPEN_HOURS")
+        with open(file_name, "w", newline="", encoding="utf-8") as outfile:
+            csv_writer = csv.writer(outfile)
+            csv_writer.writerow(header)
+            for row in rows:
+                csv_writer.writerow([row.get(x, "%s %s" % (x, len(x))) for x in header])
+        return header
+
+    return write_places_file
+
+
+# ----------------------------------------
+@pytest.fixture(name="write_mixed_file")
+def fixture_write_mixed_file(write_places_file):
+    # --quoted line breaks and quotes, empty and non ascii values, both line endings
+    # --and rows short of or past the header, in mapped and unmapped columns
+    def write_mixed_file(file_name):
+        rows = []
+        for row_num in range(3000):
+            row = {"PLACEKEY": "place-%s" % row_num}
+            if row_num % 3 == 0:
+                row["LOCATION_NAME"] = 'the "%s"\nplace, café' % row_num
+            if row_num % 5 == 0:
+                row["POLYGON_WKT"] = "POLYGON ((%s))" % ",\n".join(
+                    "-73.%06d 40.%06d" % (x, x) for x in range(row_num % 50)
+                )
+            if row_num % 7 == 0:
+                row["STREET_ADDRESS"] = ""
+            if row_num % 11 == 0:
+                row["OPEN_HOURS"] = '{"Mon": [["8:00", "17:00"]]}\r\n'
+            rows.append(row)
+        header = write_places_file(file_name, rows)
+        with open(file_name, "a", encoding="utf-8", newline="") as outfile:
+            outfile.write("short-row,values\n")
+            outfile.write(",".join("value" for _ in header) + ",extra,values\n")
+            outfile.write(",".join('"a\nvalue"' for _ in header) + "\n")
+
+    return write_mixed_file
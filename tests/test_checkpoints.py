@@ -0,0 +1,78 @@
+import glob
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+
+# ----------------------------------------
+def get_stat_counts(stat_pack):
+    # --the examples kept depend on where the run was resumed, the counts do not
+    if isinstance(stat_pack, dict):
+        return {x: get_stat_counts(stat_pack[x]) for x in stat_pack if x != "examples"}
+    return stat_pack
+
+
+# ----------------------------------------
+def read_run(output_file, log_file):
+    with open(output_file, "rb") as infile:
+        output = infile.read()
+    with open(log_file, "r", encoding="utf-8") as infile:
+        return output, get_stat_counts(json.load(infile))
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "compression_ext, options",
+    [("", []), (".zst", []), ("", ["--sort_output", "placekey", "--workers", "2"])],
+    ids=["csv", "zst", "sorted"],
+)
+def test_killed_run_resumes_to_the_same_output(tmp_path, write_places_file, compression_ext, options):
+    if compression_ext == ".zst":
+        zstandard = pytest.importorskip("zstandard")
+    input_file = str(tmp_path / "places.csv")
+    write_places_file(input_file, [{"PLACEKEY": "place-%s@5qw-%s" % (x, x % 97)} for x in range(100000)])
+    if compression_ext == ".zst":
+        # --zstandard input cannot seek, a resume reads its way forward to the checkpoint
+        with open(input_file, "rb") as infile, zstandard.open(input_file + ".zst", "wb") as outfile:
+            outfile.write(infile.read())
+        input_file += ".zst"
+
+    clean_output = str(tmp_path / "clean.json")
+    clean_log = str(tmp_path / "clean-stats.json")
+    subprocess.run(
+        [sys.executable, script_file, "-i", input_file, "-o", clean_output, "-l", clean_log] + options,
+        check=True,
+        capture_output=True,
+    )
+
+    output_file = str(tmp_path / "output.json")
+    log_file = str(tmp_path / "output-stats.json")
+    command = [sys.executable, script_file, "-i", input_file, "-o", output_file, "-l", log_file] + options
+    # --sorted runs checkpoint the records mapped into the output-sort directory
+    checkpoint_pattern = str(tmp_path / "output*" / "*.checkpoint") if options else output_file + ".checkpoint"
+    # --the run and its workers are killed together, like the whole machine going down
+    with subprocess.Popen(
+        command + ["--checkpoint_interval", "500"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    ) as process:
+        while not glob.glob(checkpoint_pattern) and process.poll() is None:
+            time.sleep(0.01)
+        os.killpg(process.pid, signal.SIGKILL)
+    assert glob.glob(checkpoint_pattern)
+    for checkpoint_file in glob.glob(checkpoint_pattern):
+        with open(checkpoint_file, "r", encoding="utf-8") as infile:
+            checkpoint = json.load(infile)
+        assert not checkpoint["complete"]
+        assert checkpoint["input_row_count"] < 100000
+
+    subprocess.run(command + ["--resume"], check=True, capture_output=True)
+    assert read_run(output_file, log_file) == read_run(clean_output, clean_log)
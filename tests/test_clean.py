@@ -0,0 +1,69 @@
+import pytest
+
+from safegraph_mapper.mapping import mapper
+
+# --every character str.split() splits on
+whitespace_chars = [chr(x) for x in range(0x3001) if chr(x).isspace()]
+
+raw_values = [
+    "",
+    " ",
+    "   ",
+    "plain value",
+    "  leading",
+    "trailing  ",
+    "inner  double",
+    "tab\tand\nnewline\r\n",
+    'a "quoted" value',
+    '"null"',
+    "'N/A'",
+    "null",
+    "NULL",
+    " Null ",
+    "nul",
+    "n/a",
+    "N/A\t",
+    "null value",
+    "NULLS",
+    "\x01control\x7f",
+    "zero\u200bwidth",
+    "café  Zoë",
+    "控制 字符",
+] + ["a%sb%s" % (x, x) for x in whitespace_chars]
+
+
+# ----------------------------------------
+def clean_value_baseline(raw_value):
+    # --clean_value() before the fast path, every value split and joined
+    if not raw_value:
+        return ""
+    new_value = " ".join(str(raw_value).strip().split())
+    if new_value.upper() in ["NULL", "NUL", "N/A"]:
+        return ""
+    return new_value
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("raw_value", raw_values)
+def test_fast_path_cleans_like_the_slow_path(raw_value):
+    sg_mapper = mapper("off")
+    expected_value = clean_value_baseline(raw_value)
+    assert sg_mapper.clean_value(raw_value) == expected_value
+    column_cleaner = sg_mapper.get_column_cleaner()
+    assert column_cleaner(raw_value) == expected_value
+    assert column_cleaner(raw_value) == expected_value
+
+
+# ----------------------------------------
+def test_non_string_values_are_cleaned():
+    sg_mapper = mapper("off")
+    for raw_value in [0, 12, 1.5, None, True]:
+        assert sg_mapper.clean_value(raw_value) == clean_value_baseline(raw_value)
+
+
+# ----------------------------------------
+def test_columns_clean_like_values():
+    pyarrow = pytest.importorskip("pyarrow")
+    sg_mapper = mapper("off")
+    new_values = sg_mapper.clean_column(pyarrow.array(raw_values + [None], pyarrow.string())).to_pylist()
+    assert [x or "" for x in new_values] == [clean_value_baseline(x) for x in raw_values + [None]]
@@ -0,0 +1,58 @@
+import pytest
+
+from safegraph_mapper.mapping import map_batch, mapper
+from safegraph_mapper.serializers import json_dumps_line, json_lines_from_columns
+
+pyarrow = pytest.importorskip("pyarrow")
+
+# --every control character, quotes and backslashes next to each other, non ascii text
+# --and characters json leaves as they are, nulls and empty strings
+column_values = {
+    "NAME": [
+        "".join(chr(x) for x in range(32)),
+        'a "quoted" \\ back\\\\slash \\"',
+        "Café Zoë 控制 \U0001f600 \x7f   ",
+        None,
+        "",
+        "\\u0041 \\n",
+    ],
+    "CITY": [None, "plain", None, None, '"', "\\"],
+    "EMPTY": [None] * 6,
+}
+
+
+# ----------------------------------------
+def test_columns_encode_like_the_serializer():
+    mapped_columns = [(x, pyarrow.array(column_values[x], pyarrow.string())) for x in column_values]
+    expected_lines = b""
+    for row_num in range(6):
+        json_data = {x: column_values[x][row_num] for x in column_values if column_values[x][row_num] is not None}
+        expected_lines += json_dumps_line(json_data)
+    assert json_lines_from_columns(mapped_columns) == expected_lines
+
+
+# ----------------------------------------
+def test_record_batches_map_like_rows():
+    rows = [
+        {
+            "PLACEKEY": "222-222@5qw-shj-7qz",
+            "LOCATION_NAME": 'Café "Zoë"\tand\\   \U0001f600',
+            "LATITUDE": "40.748817",
+            "LONGITUDE": "-73.985428",
+            "ISO_COUNTRY_CODE": "US",
+            "FULL_ADDRESS": "350 5th Ave\nNew York, NY 10118",
+        },
+        {
+            "PLACEKEY": "223-222@5qw-shj-7qz",
+            "LOCATION_NAME": "控制\x01字符\x1f \"null\" '\\'",
+            "STREET_ADDRESS": "",
+            "OPENED_ON": "2019-07",
+            "ISO_COUNTRY_CODE": "JP",
+        },
+        {"PLACEKEY": "224-222@5qw-shj-7qz", "LOCATION_NAME": "null", "CITY": "  "},
+    ]
+    column_names = mapper().mapped_columns
+    record_batch = pyarrow.RecordBatch.from_pydict(
+        {x: pyarrow.array([row.get(x) for row in rows], pyarrow.string()) for x in column_names}
+    )
+    assert map_batch(record_batch, mapper()) == map_batch(rows, mapper(), serializer="json")
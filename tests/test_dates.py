@@ -0,0 +1,31 @@
+import pytest
+
+from safegraph_mapper.mapping import mapper, parse_any_date
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "raw_date, new_date",
+    [
+        ("March 5, 2019", "2019-03-05"),
+        ("March 2019", "2019-03"),
+        ("2019", "2019"),
+        ("5 Jan 1900", "1900-01-05"),
+        ("Jan 1900", "1900-01"),
+        ("1 Feb 1901", "1901-02-01"),
+        ("2 Jan 1901", "1901-01-02"),
+    ],
+)
+def test_missing_parts_are_left_out(raw_date, new_date):
+    assert parse_any_date(raw_date) == new_date
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("raw_date", ["March 5", "5th", "12:30"])
+def test_dates_without_a_year_are_bad(raw_date):
+    with pytest.raises(ValueError):
+        parse_any_date(raw_date)
+    sg_mapper = mapper("counts")
+    assert sg_mapper.normalize_date(raw_date) == ""
+    assert sg_mapper.format_date(raw_date) == ""
+    assert sg_mapper.stat_pack["!INFO"]["BAD_DATE"]["count"] == 2
@@ -0,0 +1,114 @@
+import glob
+import json
+import os
+import struct
+import subprocess
+import sys
+
+import pytest
+
+from safegraph_mapper import indexes
+from safegraph_mapper.indexes import delta_index, get_key_hash, upgrade_delta_index, write_delta_index
+from safegraph_mapper.serializers import json_dumps_line
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+
+# ----------------------------------------
+def run_delta(tmp_path, index_file, record_hashes):
+    # --one delta run over {record id: record hash}, returns the status of each
+    # --record and the record ids deleted
+    run_file_prefix = str(tmp_path / ("run%s" % len(glob.glob(str(tmp_path / "run*")))))
+    delta = delta_index(index_file, run_file_prefix, run_size=2)
+    statuses = {x: delta.check_record(x, record_hashes[x]) for x in record_hashes}
+    delta.close()
+    delete_file = str(tmp_path / "deletes.json")
+    write_delta_index(index_file, sorted(glob.glob(run_file_prefix + "-*")), delete_file, json_dumps_line)
+    with open(delete_file, "r", encoding="utf-8") as infile:
+        return statuses, sorted(json.loads(x)["RECORD_ID"] for x in infile)
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("key_hash", [None, 7], ids=["blake2b", "colliding"])
+def test_delta_is_confirmed_by_record_id(tmp_path, monkeypatch, key_hash):
+    # --with every record id hashed the same, only the strings tell them apart
+    if key_hash is not None:
+        monkeypatch.setattr(indexes, "get_key_hash", lambda record_id: key_hash)
+    index_file = str(tmp_path / "delta.idx")
+    statuses, deletes = run_delta(tmp_path, index_file, {"aaa-1": 1, "bbb-2": 2, "ccc-3": 3})
+    assert set(statuses.values()) == {"NEW"}
+    assert not deletes
+
+    record_hashes = {"aaa-1": 1, "bbb-2": 20, "ddd-4": 4}
+    statuses, deletes = run_delta(tmp_path, index_file, record_hashes)
+    assert statuses == {"aaa-1": "UNCHANGED", "bbb-2": "CHANGED", "ddd-4": "NEW"}
+    assert deletes == ["ccc-3"]
+
+    # --a rerun on the same records has nothing to write
+    statuses, deletes = run_delta(tmp_path, index_file, record_hashes)
+    assert set(statuses.values()) == {"UNCHANGED"}
+    assert not deletes
+
+
+# ----------------------------------------
+def test_old_delta_index_is_upgraded(tmp_path):
+    # --an SGDELTA1 index, (key hash, record hash) entries then the record ids
+    record_hashes = {"aaa-1": 1, "bbb-2": 2, "ccc-3": 3}
+    entries = sorted((get_key_hash(x), record_hashes[x], x) for x in record_hashes)
+    index_file = str(tmp_path / "delta.idx")
+    with open(index_file, "wb") as outfile:
+        outfile.write(b"SGDELTA1" + struct.pack("=Q", len(entries)))
+        for key_hash, record_hash, _ in entries:
+            outfile.write(struct.pack("=QQ", key_hash, record_hash))
+        for _, _, record_id in entries:
+            outfile.write(record_id.encode("utf-8") + b"\n")
+    with pytest.raises(ValueError):
+        delta_index(index_file, str(tmp_path / "run"))
+    assert upgrade_delta_index(index_file)
+    assert not upgrade_delta_index(index_file)
+
+    statuses, deletes = run_delta(tmp_path, index_file, {"aaa-1": 1, "bbb-2": 20})
+    assert statuses == {"aaa-1": "UNCHANGED", "bbb-2": "CHANGED"}
+    assert deletes == ["ccc-3"]
+
+
+# ----------------------------------------
+def test_delta_runs_write_new_changed_and_deleted(tmp_path, write_places_file):
+    index_file = str(tmp_path / "delta.idx")
+
+    def map_release(rows):
+        input_file = str(tmp_path / "places.csv")
+        write_places_file(input_file, rows)
+        output_file = str(tmp_path / "output.json")
+        delete_file = str(tmp_path / "deletes.json")
+        subprocess.run(
+            [
+                sys.executable,
+                script_file,
+                "-i",
+                input_file,
+                "-o",
+                output_file,
+                "--delta_index",
+                index_file,
+                "--delete_file",
+                delete_file,
+            ],
+            check=True,
+            capture_output=True,
+        )
+        with open(output_file, "r", encoding="utf-8") as infile:
+            record_ids = sorted(json.loads(x)["RECORD_ID"] for x in infile)
+        with open(delete_file, "r", encoding="utf-8") as infile:
+            return record_ids, sorted(json.loads(x)["RECORD_ID"] for x in infile)
+
+    rows = [{"PLACEKEY": "place-%s" % x, "LOCATION_NAME": "place %s" % x} for x in range(100)]
+    record_ids, deletes = map_release(rows)
+    assert len(record_ids) == 100
+    assert not deletes
+
+    rows[5]["LOCATION_NAME"] = "renamed place"
+    del rows[7]
+    rows.append({"PLACEKEY": "place-new", "LOCATION_NAME": "new place"})
+    assert map_release(rows) == (["place-5", "place-new"], ["place-7"])
+    assert map_release(rows) == ([], [])
@@ -0,0 +1,56 @@
+import argparse
+
+import pytest
+
+from safegraph_mapper import indexes
+from safegraph_mapper.indexes import duplicate_index, find_duplicates, read_place_keys
+from safegraph_mapper.mapping import mapper
+
+placekeys = ["aaa-1", "bbb-2", "aaa-1", "ccc-3", "bbb-2", "aaa-1", "ddd-4"]
+
+
+# ----------------------------------------
+def check_records(tmp_path, write_places_file, policy):
+    input_file = str(tmp_path / "places.csv")
+    write_places_file(input_file, [{"PLACEKEY": x} for x in placekeys])
+    args = argparse.Namespace(input_files=[input_file], reader="csv", bloom_size=1, batch_size=1000)
+    index_file, report = find_duplicates(args, str(tmp_path))
+    assert report["duplicate_records"] == 3
+    assert report["duplicated_record_ids"] == 2
+
+    sg_mapper = mapper()
+    duplicates = duplicate_index(index_file, policy)
+    record_ids = []
+    for position, placekey, _ in read_place_keys(args):
+        json_data = duplicates.check_record(sg_mapper, {"RECORD_ID": placekey}, position)
+        if json_data:
+            record_ids.append(json_data["RECORD_ID"])
+    duplicates.close()
+    return record_ids
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("key_hash", [None, 7], ids=["blake2b", "colliding"])
+def test_duplicates_are_confirmed_by_record_id(tmp_path, write_places_file, monkeypatch, key_hash):
+    # --with every record id hashed the same, only the strings tell them apart
+    if key_hash is not None:
+        monkeypatch.setattr(indexes, "get_key_hash", lambda record_id: key_hash)
+    record_ids = check_records(tmp_path, write_places_file, "first")
+    assert record_ids == ["aaa-1", "bbb-2", "ccc-3", "ddd-4"]
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("key_hash", [None, 7], ids=["blake2b", "colliding"])
+def test_rename_numbers_duplicates_in_input_order(tmp_path, write_places_file, monkeypatch, key_hash):
+    if key_hash is not None:
+        monkeypatch.setattr(indexes, "get_key_hash", lambda record_id: key_hash)
+    record_ids = check_records(tmp_path, write_places_file, "rename")
+    assert record_ids == [
+        "aaa-1",
+        "bbb-2",
+        "aaa-1-2",
+        "ccc-3",
+        "bbb-2-2",
+        "aaa-1-3",
+        "ddd-4",
+    ]
@@ -0,0 +1,58 @@
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+from safegraph_mapper.files import open_input_file, open_output_file
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+compression_exts = [
+    ".gz",
+    ".bz2",
+    ".xz",
+    pytest.param(
+        ".zst",
+        marks=pytest.mark.skipif(not importlib.util.find_spec("zstandard"), reason="zstandard is not installed"),
+    ),
+]
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("compression_ext", compression_exts)
+def test_compressed_files_round_trip(tmp_path, compression_ext):
+    file_name = str(tmp_path / ("lines.json" + compression_ext))
+    lines = [('{"RECORD_ID":"%s","NAME":"café \\"%s\\""}\n' % (x, x)).encode("utf-8") for x in range(20000)]
+    output_file_handle = open_output_file(file_name)
+    output_file_handle.write(b"".join(lines))
+    output_file_handle.close()
+    with open(file_name, "rb") as infile:
+        assert infile.read(4) != lines[0][:4]
+    with open_input_file(file_name) as infile:
+        assert infile.readlines() == lines
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("compression_ext", compression_exts)
+def test_compressed_input_and_output_map_the_same(tmp_path, write_mixed_file, compression_ext):
+    input_file = str(tmp_path / "places.csv")
+    write_mixed_file(input_file)
+    subprocess.run(
+        [sys.executable, script_file, "-i", input_file, "-o", str(tmp_path / "plain.json")],
+        check=True,
+        capture_output=True,
+    )
+    with open(input_file, "rb") as infile:
+        output_file_handle = open_output_file(input_file + compression_ext)
+        output_file_handle.write(infile.read())
+        output_file_handle.close()
+    output_file = str(tmp_path / ("output.json" + compression_ext))
+    subprocess.run(
+        [sys.executable, script_file, "-i", input_file + compression_ext, "-o", output_file, "-w", "2"],
+        check=True,
+        capture_output=True,
+    )
+    with open(str(tmp_path / "plain.json"), "rb") as plain_file, open_input_file(output_file) as infile:
+        assert infile.read() == plain_file.read()
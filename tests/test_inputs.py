@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from safegraph_mapper.files import get_input_files
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+# --file name and row count, written out of name order and with the largest file
+# --queued first so neither order matches the output order by chance
+input_file_rows = [("b.csv", 300), ("a.csv", 50), ("c.csv.gz", 120)]
+
+
+# ----------------------------------------
+def write_input_files(input_dir, write_places_file):
+    os.makedirs(input_dir)
+    for file_name, row_count in input_file_rows:
+        csv_file = os.path.join(input_dir, file_name.replace(".gz", ""))
+        write_places_file(
+            csv_file, [{"PLACEKEY": "%s-%s" % (file_name[0], x), "PARENT_PLACEKEY": ""} for x in range(row_count)]
+        )
+        if file_name.endswith(".gz"):
+            subprocess.run(["gzip", csv_file], check=True)
+    return [os.path.join(input_dir, x[0]) for x in sorted(input_file_rows)]
+
+
+# ----------------------------------------
+def test_directory_and_glob_expand_in_name_order(tmp_path, write_places_file):
+    input_dir = str(tmp_path / "places")
+    input_files = write_input_files(input_dir, write_places_file)
+    # --files that are not input files and sub directories are left out
+    with open(os.path.join(input_dir, "README.txt"), "w", encoding="utf-8") as outfile:
+        outfile.write("not places\n")
+    os.makedirs(os.path.join(input_dir, "z.csv"))
+
+    assert get_input_files(input_dir) == input_files
+    assert get_input_files(os.path.join(input_dir, "*.csv*")) == input_files
+    assert get_input_files(os.path.join(input_dir, "[bc]*")) == input_files[1:]
+    assert get_input_files(input_files[0]) == input_files[:1]
+    assert not get_input_files(os.path.join(input_dir, "*.parquet"))
+
+
+# ----------------------------------------
+def map_files(input_spec, output_file, *options):
+    log_file = os.path.splitext(output_file)[0] + "-stats.json"
+    subprocess.run(
+        [sys.executable, script_file, "-i", input_spec, "-o", output_file, "-l", log_file, *options],
+        check=True,
+        capture_output=True,
+    )
+    with open(output_file, "rb") as infile:
+        output_bytes = infile.read()
+    with open(log_file, "r", encoding="utf-8") as infile:
+        stat_pack = json.load(infile)
+    return output_bytes, stat_pack
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("worker_count", ["1", "2"])
+@pytest.mark.parametrize("glob_pattern", [None, "*.csv*"], ids=["directory", "glob"])
+def test_files_are_merged_in_name_order(tmp_path, write_places_file, worker_count, glob_pattern):
+    input_dir = str(tmp_path / "places")
+    input_files = write_input_files(input_dir, write_places_file)
+    expected_output = b"".join(
+        map_files(x, str(tmp_path / ("%s.json" % file_num)))[0] for file_num, x in enumerate(input_files)
+    )
+
+    input_spec = os.path.join(input_dir, glob_pattern) if glob_pattern else input_dir
+    output_bytes, stat_pack = map_files(input_spec, str(tmp_path / "output.json"), "-w", worker_count)
+    assert output_bytes == expected_output
+
+    # --the statistics and the run report count the rows of every file
+    row_count = sum(x[1] for x in input_file_rows)
+    assert stat_pack["SAFEGRAPH"]["PLACEKEY"]["count"] == row_count
+    assert stat_pack["!INFO"]["INPUT_FILES"] == {"count": 3, "examples": input_files}
+    with open(str(tmp_path / "output-stats-run.json"), "r", encoding="utf-8") as infile:
+        run_report = json.load(infile)
+    assert run_report["input_files"] == input_files
+    assert run_report["rows_read"] == row_count
+    assert run_report["rows_written"] == row_count
+    assert run_report["input_bytes"] == sum(os.path.getsize(x) for x in input_files)
+
+
+# ----------------------------------------
+def test_duplicates_are_found_across_files(tmp_path, write_places_file):
+    input_dir = str(tmp_path / "places")
+    os.makedirs(input_dir)
+    write_places_file(os.path.join(input_dir, "a.csv"), [{"PLACEKEY": x} for x in ["aaa-1", "bbb-2"]])
+    write_places_file(os.path.join(input_dir, "b.csv"), [{"PLACEKEY": x} for x in ["bbb-2", "ccc-3", "aaa-1"]])
+    output_bytes, _ = map_files(input_dir, str(tmp_path / "output.json"), "-w", "2", "--duplicates", "rename")
+    record_ids = [json.loads(x)["RECORD_ID"] for x in output_bytes.splitlines()]
+    assert record_ids == ["aaa-1", "bbb-2", "bbb-2-2", "ccc-3", "aaa-1-2"]
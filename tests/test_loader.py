@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+from safegraph_mapper.loader import record_loader
+
+
+class retryable_error(Exception):
+    pass
+
+
+# =========================
+class stub_engine:
+    # --the add_record() interface of the senzing engines, records named "bad-" fail,
+    # --"retry-" ones fail twice with a retryable error before they load and "stuck-"
+    # --ones always fail with one
+    def __init__(self, delay=0.0):
+        self.lock = threading.Lock()
+        self.delay = delay
+        self.attempts = {}
+        self.loaded = []
+        self.threads = set()
+
+    # ----------------------------------------
+    def add_record(self, data_source, record_id, record_json):
+        time.sleep(self.delay)
+        with self.lock:
+            self.attempts[record_id] = self.attempts.get(record_id, 0) + 1
+            self.threads.add(threading.current_thread().name)
+            if record_id.startswith("bad-"):
+                raise ValueError("bad record")
+            if record_id.startswith("stuck-") or (record_id.startswith("retry-") and self.attempts[record_id] <= 2):
+                raise retryable_error("record locked")
+            self.loaded.append((data_source, record_id, record_json))
+
+    # ----------------------------------------
+    def get_record_ids(self):
+        return sorted(x[1] for x in self.loaded)
+
+
+# ----------------------------------------
+def load_records(engine, record_ids, thread_count=4, batch_size=7, queue_size=2):
+    loader = record_loader(
+        engine.add_record,
+        thread_count,
+        batch_size,
+        queue_size,
+        retry_errors=(retryable_error,),
+        retry_seconds=0,
+    )
+    for record_id in record_ids:
+        loader.add("SAFEGRAPH", record_id, '{"RECORD_ID":"%s"}' % record_id)
+    return loader, loader.close()
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("thread_count", [1, 4])
+def test_every_record_is_loaded_once(thread_count):
+    engine = stub_engine()
+    record_ids = ["place-%s" % x for x in range(1000)]
+    loader, counts = load_records(engine, record_ids, thread_count)
+    assert counts == (1000, 0)
+    assert loader.retried_count == 0
+    assert engine.get_record_ids() == sorted(record_ids)
+    assert engine.loaded[0][0] == "SAFEGRAPH"
+    assert engine.loaded[0][2] == '{"RECORD_ID":"%s"}' % engine.loaded[0][1]
+    assert 1 <= len(engine.threads) <= thread_count
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("thread_count", [1, 4])
+def test_failures_are_counted(thread_count):
+    engine = stub_engine()
+    record_ids = ["place-%s" % x for x in range(100)]
+    record_ids += ["bad-%s" % x for x in range(6)] + ["stuck-%s" % x for x in range(4)]
+    loader, counts = load_records(engine, record_ids, thread_count)
+    assert counts == (100, 10)
+    assert len(loader.error_examples) == 5
+    assert engine.get_record_ids() == sorted(record_ids[:100])
+    # --other errors are not retried, retryable ones are given up on after 3 retries
+    assert all(engine.attempts["bad-%s" % x] == 1 for x in range(6))
+    assert all(engine.attempts["stuck-%s" % x] == 4 for x in range(4))
+    assert loader.retried_count == 12
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("thread_count", [1, 4])
+def test_retryable_errors_are_retried(thread_count):
+    engine = stub_engine()
+    record_ids = ["place-%s" % x for x in range(100)] + ["retry-%s" % x for x in range(10)]
+    loader, counts = load_records(engine, record_ids, thread_count)
+    assert counts == (110, 0)
+    assert loader.retried_count == 20
+    assert all(engine.attempts["retry-%s" % x] == 3 for x in range(10))
+
+
+# ----------------------------------------
+def test_full_queue_holds_mapping_back():
+    # --one slow thread and a one batch queue, adding records has to wait for it
+    engine = stub_engine(delay=0.01)
+    record_ids = ["place-%s" % x for x in range(20)]
+    loader, counts = load_records(engine, record_ids, thread_count=1, batch_size=1, queue_size=1)
+    assert counts == (20, 0)
+    assert loader.stall_seconds > 0
+    assert engine.get_record_ids() == sorted(record_ids)
@@ -0,0 +1,165 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import urllib.request
+
+import pytest
+
+from safegraph_mapper.monitor import metric_list, progress_fields, run_monitor, start_metrics_server
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+status_keys = [
+    "status",
+    "phase",
+    "elapsed_seconds",
+    "rows_read",
+    "rows_written",
+    "rows_read_per_sec",
+    "rows_written_per_sec",
+    "bytes_read",
+    "bytes_written",
+    "bytes_read_per_sec",
+    "input_offsets",
+    "done_ratio",
+    "eta_seconds",
+    "workers",
+    "busy_workers",
+    "worker_utilization",
+    "file_ranges",
+    "file_ranges_done",
+]
+
+# --a metric line of the prometheus text format: a name, optional labels and a number
+sample_pattern = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[a-zA-Z_][a-zA-Z0-9_]*="[^"\\\n]*"\})? (-?[0-9.e+-]+)$')
+
+
+# ----------------------------------------
+def check_metrics_text(metrics_text):
+    # --every metric has its HELP and TYPE lines before its samples, returns the samples
+    assert metrics_text.endswith("\n")
+    metric_types = {}
+    samples = {}
+    for metric_line in metrics_text.splitlines():
+        if metric_line.startswith("# HELP "):
+            metric_name = metric_line.split(" ")[2]
+            assert metric_name not in metric_types
+        elif metric_line.startswith("# TYPE "):
+            _, _, type_name, metric_type = metric_line.split(" ")
+            assert type_name == metric_name
+            assert metric_type in ["counter", "gauge"]
+            assert metric_type != "counter" or metric_name.endswith("_total")
+            metric_types[metric_name] = metric_type
+        else:
+            sample_match = sample_pattern.match(metric_line)
+            assert sample_match, metric_line
+            assert sample_match.group(1) == metric_name
+            samples[sample_match.group(1) + (sample_match.group(2) or "")] = float(sample_match.group(3))
+    assert all(x.startswith("safegraph_mapper_") for x in metric_types)
+    return samples
+
+
+# ----------------------------------------
+@pytest.fixture(name="monitor")
+def fixture_monitor(tmp_path):
+    # --two file ranges of 1000 and 500 bytes, the first done and the second part way
+    monitor = run_monitor(2, str(tmp_path / "status.json"), interval=3600)
+    progress_counts = [0] * (2 * progress_fields)
+    monitor.watch(progress_counts, [(0, 1000, 1), (1000, 500, 1)], 2)
+    progress_counts[:progress_fields] = [40, 38, 1000, 9000, 2]
+    progress_counts[progress_fields:] = [10, 10, 250, 2500, 1]
+    yield monitor
+    monitor.close("completed")
+
+
+# ----------------------------------------
+def test_status_file_has_every_key(tmp_path, monitor):
+    monitor.update_status("running")
+    with open(str(tmp_path / "status.json"), "r", encoding="utf-8") as infile:
+        status = json.load(infile)
+    assert list(status) == status_keys
+    assert status["status"] == "running"
+    assert status["phase"] == "mapping"
+    assert (status["rows_read"], status["rows_written"]) == (50, 48)
+    assert (status["bytes_read"], status["bytes_written"]) == (1250, 11500)
+    assert status["input_offsets"] == [1000, 1250]
+    assert status["done_ratio"] == pytest.approx(1250 / 1500, abs=0.0001)
+    assert status["eta_seconds"] is not None
+    assert (status["workers"], status["busy_workers"], status["worker_utilization"]) == (2, 1, 0.5)
+    assert (status["file_ranges"], status["file_ranges_done"]) == (2, 1)
+
+    monitor.close("aborted")
+    with open(str(tmp_path / "status.json"), "r", encoding="utf-8") as infile:
+        status = json.load(infile)
+    assert (status["status"], status["phase"]) == ("aborted", "finished")
+
+
+# ----------------------------------------
+def test_metrics_text_format(monitor):
+    monitor.update_status("running")
+    samples = check_metrics_text(monitor.get_metrics_text())
+    assert len(samples) == len(metric_list) + 2
+    assert samples["safegraph_mapper_rows_read_total"] == 50
+    assert samples["safegraph_mapper_bytes_written_total"] == 11500
+    assert samples["safegraph_mapper_worker_utilization"] == 0.5
+    assert samples['safegraph_mapper_input_offset{file_range="1"}'] == 1000
+    assert samples['safegraph_mapper_input_offset{file_range="2"}'] == 1250
+
+    # --the size of a compressed range is not known, so neither is the eta
+    monitor.watch(monitor.progress_counts, [(0, None, 1), (1000, None, 1)], 2)
+    monitor.update_status("running")
+    samples = check_metrics_text(monitor.get_metrics_text())
+    assert "safegraph_mapper_done_ratio" not in samples
+    assert "safegraph_mapper_eta_seconds" not in samples
+    assert samples["safegraph_mapper_rows_written_total"] == 48
+
+
+# ----------------------------------------
+def test_metrics_server_serves_the_metrics(monitor):
+    monitor.update_status("running")
+    server = start_metrics_server(monitor, 0)
+    try:
+        with urllib.request.urlopen("http://127.0.0.1:%s/metrics" % server.server_address[1], timeout=10) as response:
+            assert response.headers["Content-Type"] == "text/plain; version=0.0.4"
+            assert response.read().decode("utf-8") == monitor.get_metrics_text()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("worker_count", ["1", "3"])
+def test_final_status_of_a_run(tmp_path, write_places_file, worker_count):
+    input_file = str(tmp_path / "places.csv")
+    write_places_file(input_file, [{"PLACEKEY": "place-%s" % x, "PARENT_PLACEKEY": ""} for x in range(2500)])
+    status_file = str(tmp_path / "status.json")
+    subprocess.run(
+        [
+            sys.executable,
+            script_file,
+            "-i",
+            input_file,
+            "-o",
+            str(tmp_path / "output.json"),
+            "-w",
+            worker_count,
+            "--status_file",
+            status_file,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    with open(status_file, "r", encoding="utf-8") as infile:
+        status = json.load(infile)
+    assert list(status) == status_keys
+    assert (status["status"], status["phase"]) == ("completed", "finished")
+    assert (status["rows_read"], status["rows_written"]) == (2500, 2500)
+    # --the header line is read before the first file range starts
+    with open(input_file, "rb") as infile:
+        header_size = len(infile.readline())
+    assert status["bytes_read"] == os.path.getsize(input_file) - header_size
+    assert status["bytes_written"] == os.path.getsize(str(tmp_path / "output.json"))
+    assert status["done_ratio"] == 1.0
+    assert status["file_ranges"] == status["file_ranges_done"]
@@ -0,0 +1,38 @@
+import pickle
+
+import safegraph_mapper
+
+rows = [
+    {
+        "PLACEKEY": "222-222@5qw-shj-7qz",
+        "PARENT_PLACEKEY": "zzw-222@5qw-shj-7qz",
+        "LOCATION_NAME": "Corner  Coffee",
+        "TOP_CATEGORY": "Restaurants and Other Eating Places",
+        "SUB_CATEGORY": "Snack and Nonalcoholic Beverage Bars",
+        "NAICS_CODE": "722515",
+        "LATITUDE": "40.748817",
+        "LONGITUDE": "-73.985428",
+        "OPENED_ON": "2019-07",
+        "PHONE_NUMBER": "+12125551234",
+        "ISO_COUNTRY_CODE": "US",
+        "FULL_ADDRESS": "350 5th Ave, New York, NY 10118",
+    },
+    {
+        "PLACEKEY": "223-222@5qw-shj-7qz",
+        "LOCATION_NAME": "Corner Books",
+        "TOP_CATEGORY": "Book Stores and News Dealers",
+        "NAICS_CODE": "451211",
+        "CLOSED_ON": "2021-01",
+        "ISO_COUNTRY_CODE": "US",
+    },
+]
+
+
+# ----------------------------------------
+def test_mapper_pickles():
+    sg_mapper = safegraph_mapper.mapper()
+    first_lines = safegraph_mapper.map_batch(rows, sg_mapper)
+    sg_mapper = pickle.loads(pickle.dumps(sg_mapper))
+    assert isinstance(sg_mapper, safegraph_mapper.mapper)
+    assert safegraph_mapper.map_batch(rows, sg_mapper) == first_lines
+    assert sg_mapper.stat_pack["SAFEGRAPH"]["PLACEKEY"]["count"] == 4
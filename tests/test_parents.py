@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from safegraph_mapper.indexes import build_parent_index, placekey_index
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+# --place-a has 3 children and place-b 1, the parents missing-z with 2 and missing-y
+# --with 1 are not in the file, a place pointing at itself or at nothing has no parent
+parent_placekeys = {
+    "place-a": "",
+    "place-b": "place-a",
+    "place-c": "place-a",
+    "place-d": "place-a",
+    "place-e": "missing-z",
+    "place-f": "missing-z",
+    "place-g": "missing-y",
+    "place-h": "place-h",
+    "place-i": "place-b",
+}
+
+
+# ----------------------------------------
+def write_parents_file(tmp_path, write_places_file):
+    input_file = str(tmp_path / "places.csv")
+    write_places_file(input_file, [{"PLACEKEY": x, "PARENT_PLACEKEY": y} for x, y in parent_placekeys.items()])
+    return input_file
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("reader_type", ["csv", "projected", "mmap"])
+def test_parent_index_reports_dangling_parents(tmp_path, write_places_file, reader_type):
+    args = argparse.Namespace(
+        input_files=[write_parents_file(tmp_path, write_places_file)], reader=reader_type, batch_size=1000
+    )
+    # --a run size of 4 spreads the placekeys and parent pointers over several runs
+    index_file, report = build_parent_index(args, str(tmp_path), run_size=4)
+    assert report == {
+        "places": 9,
+        "parent_pointers": 7,
+        "parents": 4,
+        "dangling_pointers": 3,
+        "dangling_parents": 2,
+        "fan_out_histogram": {
+            "1": 2,
+            "2-5": 2,
+            "6-10": 0,
+            "11-50": 0,
+            "51-100": 0,
+            "101-500": 0,
+            "501-1000": 0,
+            "1001+": 0,
+        },
+        "largest_parents": [
+            {"PARENT_PLACEKEY": "place-a", "children": 3, "in_file": True},
+            {"PARENT_PLACEKEY": "missing-z", "children": 2, "in_file": False},
+            {"PARENT_PLACEKEY": "place-b", "children": 1, "in_file": True},
+            {"PARENT_PLACEKEY": "missing-y", "children": 1, "in_file": False},
+        ],
+        "largest_dangling_parents": [
+            {"PARENT_PLACEKEY": "missing-z", "children": 2},
+            {"PARENT_PLACEKEY": "missing-y", "children": 1},
+        ],
+    }
+    index = placekey_index(index_file)
+    assert all(x in index for x in parent_placekeys)
+    assert "missing-z" not in index and "missing-y" not in index
+    index.close()
+    # --the runs are removed once merged
+    assert sorted(os.listdir(str(tmp_path))) == ["placekeys.idx", "places.csv"]
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("check_option", ["--parent_check", "--drop_absent_parents"])
+def test_parent_check_counts_and_drops(tmp_path, write_places_file, check_option):
+    input_file = write_parents_file(tmp_path, write_places_file)
+    output_file = str(tmp_path / "output.json")
+    log_file = str(tmp_path / "stats.json")
+    subprocess.run(
+        [sys.executable, script_file, "-i", input_file, "-o", output_file, "-l", log_file, check_option],
+        check=True,
+        capture_output=True,
+    )
+    with open(output_file, "r", encoding="utf-8") as infile:
+        pointers = {x["RECORD_ID"]: x.get("REL_POINTER_KEY") for x in map(json.loads, infile)}
+    with open(log_file, "r", encoding="utf-8") as infile:
+        stat_pack = json.load(infile)
+    with open(str(tmp_path / "stats-parents.json"), "r", encoding="utf-8") as infile:
+        parent_report = json.load(infile)
+
+    assert stat_pack["!INFO"]["PARENT_DANGLING"]["count"] == 3
+    assert parent_report["dangling_pointers"] == 3
+    assert parent_report["largest_dangling_parents"][0] == {"PARENT_PLACEKEY": "missing-z", "children": 2}
+    expected_pointers = {x: y if y and y != x else None for x, y in parent_placekeys.items()}
+    if check_option == "--drop_absent_parents":
+        assert stat_pack["!INFO"]["PARENT_DROPPED"]["count"] == 3
+        expected_pointers.update({"place-e": None, "place-f": None, "place-g": None})
+    else:
+        assert "PARENT_DROPPED" not in stat_pack["!INFO"]
+    assert pointers == expected_pointers
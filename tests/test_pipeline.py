@@ -0,0 +1,128 @@
+import io
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from safegraph_mapper.readers import line_reader, pipelined_line_reader
+from safegraph_mapper.writers import pipelined_writer
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+
+# ----------------------------------------
+def read_lines(input_reader):
+    return [(line, input_reader.offset) for line in input_reader]
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("end_line", [None, 179, 999])
+def test_pipelined_reader_reads_like_line_reader(end_line):
+    # --chunks of 100 bytes end part way through most lines, split points are always
+    # --at the start of a line
+    file_bytes = b"".join(b"line %d %s\r\n" % (x, b"x" * (x % 37)) for x in range(1000))
+    offset = file_bytes.index(b"line 10 ")
+    end_offset = file_bytes.index(b"line %d " % end_line) if end_line else None
+    expected_lines = read_lines(line_reader(io.BytesIO(file_bytes[offset:]), offset, end_offset))
+    file_handle = io.BytesIO(file_bytes)
+    file_handle.seek(offset)
+    input_reader = pipelined_line_reader(file_handle, offset, end_offset, chunk_size=100, queue_size=2)
+    assert read_lines(input_reader) == expected_lines
+    input_reader.close()
+
+
+# ----------------------------------------
+def test_pipelined_reader_closes_part_way():
+    # --the reader thread is waiting on a full queue when mapping stops early
+    input_reader = pipelined_line_reader(io.BytesIO(b"line\n" * 100000), chunk_size=100, queue_size=2)
+    assert next(input_reader) == "line\n"
+    time.sleep(0.1)
+    input_reader.close()
+    assert not input_reader.thread.is_alive()
+
+
+# ----------------------------------------
+def test_pipelined_writer_writes_in_order():
+    file_handle = io.BytesIO()
+    file_handle.close = lambda: None
+    output_writer = pipelined_writer(file_handle, queue_size=2)
+    for batch_num in range(1000):
+        output_writer.write(b"batch %d\n" % batch_num)
+    output_writer.flush()
+    assert output_writer.tell() == len(file_handle.getvalue())
+    output_writer.write(b"")
+    output_writer.close()
+    assert file_handle.getvalue() == b"".join(b"batch %d\n" % x for x in range(1000))
+
+
+# ----------------------------------------
+def test_pipelined_writer_raises_write_errors():
+    file_handle = io.BytesIO()
+    file_handle.close()
+    output_writer = pipelined_writer(file_handle, queue_size=2)
+    output_writer.write(b"a batch\n")
+    with pytest.raises(ValueError):
+        output_writer.flush()
+    with pytest.raises(ValueError):
+        output_writer.close()
+    assert not output_writer.thread.is_alive()
+
+
+# ----------------------------------------
+def map_file(input_file, output_file, *options):
+    subprocess.run(
+        [sys.executable, script_file, "-i", input_file, "-o", output_file, *options],
+        check=True,
+        capture_output=True,
+    )
+    with open(output_file, "rb") as infile:
+        return infile.read()
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("reader_type", ["csv", "projected"])
+@pytest.mark.parametrize("worker_count", ["1", "3"])
+def test_pipeline_matches_no_pipeline(tmp_path, write_mixed_file, reader_type, worker_count):
+    input_file = str(tmp_path / "places.csv")
+    write_mixed_file(input_file)
+    expected_output = map_file(input_file, str(tmp_path / "output.json"), "--reader", reader_type)
+    pipeline_output = map_file(
+        input_file,
+        str(tmp_path / "pipeline.json"),
+        "--reader",
+        reader_type,
+        "--workers",
+        worker_count,
+        "--pipeline",
+        "--queue_size",
+        "2",
+    )
+    assert pipeline_output == expected_output
+
+
+# ----------------------------------------
+def test_pipeline_shuts_down_part_way(tmp_path, write_places_file):
+    # --an interrupted pipelined run stops its reader and writer threads, exits and
+    # --leaves a checkpoint that matches the output written so far
+    input_file = str(tmp_path / "places.csv")
+    write_places_file(input_file, [{"PLACEKEY": "place-%s" % x} for x in range(100000)])
+    expected_output = map_file(input_file, str(tmp_path / "output.json"))
+
+    output_file = str(tmp_path / "pipeline.json")
+    command = [sys.executable, script_file, "-i", input_file, "-o", output_file, "--pipeline"]
+    with subprocess.Popen(
+        command + ["--checkpoint_interval", "500"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    ) as process:
+        while not os.path.exists(output_file + ".checkpoint") and process.poll() is None:
+            time.sleep(0.01)
+        process.send_signal(signal.SIGINT)
+        stdout, _ = process.communicate(timeout=60)
+    assert b"aborted" in stdout
+    assert process.returncode == 0
+
+    subprocess.run(command + ["--resume"], check=True, capture_output=True)
+    with open(output_file, "rb") as infile:
+        assert infile.read() == expected_output
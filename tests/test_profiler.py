@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from safegraph_mapper.monitor import stage_profiler
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+
+# ----------------------------------------
+def test_sampled_stages_are_scaled_up(monkeypatch):
+    # --a clock that moves 1 ms for each parse and 3 ms for each map
+    clock = [0.0]
+    monkeypatch.setattr(time, "perf_counter", lambda: clock[0])
+    profiler = stage_profiler(10)
+    for _ in range(5):
+        profiler.start_row()
+        clock[0] += 0.001
+        profiler.mark("parse")
+        clock[0] += 0.003
+        profiler.mark("map")
+        profiler.end_row()
+    profiler.add_time("write", 0.05)
+
+    # --only the sampled stages are scaled by the interval, write is timed every time
+    stage_seconds = profiler.get_stage_seconds()
+    assert stage_seconds == pytest.approx({"parse": 0.05, "map": 0.15, "write": 0.05})
+
+    worker_profiler = stage_profiler(10)
+    worker_profiler.sampled_rows = 2
+    worker_profiler.sampled_seconds = {"map": 0.005}
+    profiler.merge(worker_profiler.get_profile())
+    report = profiler.get_report(70)
+    assert report["rows"] == 70
+    assert report["sample_interval"] == 10
+    assert report["sampled_rows"] == 7
+    assert list(report["stages"]) == ["map", "parse", "write"]
+    assert report["stages"]["map"] == {"seconds": 0.2, "percent": 66.7}
+    assert report["stages"]["parse"] == {"seconds": 0.05, "percent": 16.7}
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("worker_count", ["1", "2"])
+def test_profile_report_samples_every_interval(tmp_path, write_places_file, worker_count):
+    input_file = str(tmp_path / "places.csv")
+    write_places_file(input_file, [{"PLACEKEY": "place-%s" % x} for x in range(1000)])
+    subprocess.run(
+        [
+            sys.executable,
+            script_file,
+            "-i",
+            input_file,
+            "-o",
+            str(tmp_path / "output.json"),
+            "-l",
+            str(tmp_path / "stats.json"),
+            "-w",
+            worker_count,
+            "--profile",
+            "--profile_interval",
+            "7",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    with open(str(tmp_path / "stats-profile.json"), "r", encoding="utf-8") as infile:
+        report = json.load(infile)
+
+    # --the row after every 7th is timed, in each file range
+    assert report["rows"] == 1000
+    assert report["sample_interval"] == 7
+    assert 999 // 7 - int(worker_count) < report["sampled_rows"] <= 999 // 7
+    assert set(report["stages"]) == {
+        "parse",
+        "clean_value",
+        "map",
+        "build_record",
+        "capture_mapped_stats",
+        "serialize",
+        "write",
+    }
+    assert sum(x["percent"] for x in report["stages"].values()) == pytest.approx(100, abs=0.5)
+    assert all(x["seconds"] >= 0 for x in report["stages"].values())
@@ -0,0 +1,128 @@
+import csv
+
+import pytest
+
+from safegraph_mapper.mapping import mapper
+from safegraph_mapper.readers import (
+    get_column_indexes,
+    get_large_column_indexes,
+    line_reader,
+    mmap_reader,
+    projected_csv_reader,
+    projected_reader,
+)
+
+reader_types = ["csv", "projected", "mmap"]
+
+
+# ----------------------------------------
+def get_reader(file_handle, reader_type, max_field_size=0):
+    # --returns the rows and the reader whose offset follows them
+    input_reader = line_reader(file_handle)
+    header = next(csv.reader(input_reader))
+    column_indexes = get_column_indexes(header, mapper("off").mapped_columns)
+    skip_column_indexes = get_large_column_indexes(header, column_indexes)
+    if reader_type == "mmap":
+        input_rows = mmap_reader(
+            file_handle,
+            column_indexes,
+            input_reader.offset,
+            skip_column_indexes=skip_column_indexes,
+            max_field_size=max_field_size,
+        )
+        return input_rows, input_rows
+    if reader_type == "projected":
+        input_rows = projected_reader(
+            input_reader,
+            column_indexes,
+            skip_column_indexes=skip_column_indexes,
+            max_field_size=max_field_size,
+        )
+        return input_rows, input_rows
+    input_rows = projected_csv_reader(input_reader, len(header), column_indexes, max_field_size)
+    return input_rows, input_reader
+
+
+# ----------------------------------------
+def read_rows(file_name, reader_type, max_field_size=0):
+    with open(file_name, "rb") as file_handle:
+        input_rows, _ = get_reader(file_handle, reader_type, max_field_size)
+        return [list(x) for x in input_rows]
+
+
+# ----------------------------------------
+def read_offsets(file_name, reader_type):
+    # --the offset after each row, where a resumed run would start reading
+    with open(file_name, "rb") as file_handle:
+        input_rows, offset_reader = get_reader(file_handle, reader_type)
+        return [offset_reader.offset for _ in input_rows]
+
+
+# ----------------------------------------
+def get_polygon(point_count):
+    points = ", ".join("-%s.%06d 40.%06d" % (x % 180, x, x) for x in range(point_count))
+    return "POLYGON ((%s))" % points.replace(", -1", ",\n-1")
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("reader_type", reader_types)
+def test_large_unmapped_fields_are_skipped(tmp_path, write_places_file, reader_type):
+    # --the polygons are larger than both the field limit and a read chunk
+    file_name = str(tmp_path / "places.csv")
+    rows = [{"PLACEKEY": "place-%s" % x, "POLYGON_WKT": get_polygon(x * 20000)} for x in range(1, 5)]
+    rows[1]["OPEN_HOURS"] = "x" * 50000
+    write_places_file(file_name, rows)
+    expected_rows = read_rows(file_name, "csv")
+    assert read_rows(file_name, reader_type, max_field_size=10000) == expected_rows
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("reader_type", reader_types)
+def test_large_mapped_field_stops_the_run(tmp_path, write_places_file, reader_type):
+    file_name = str(tmp_path / "places.csv")
+    rows = [
+        {"PLACEKEY": "place-1"},
+        {"PLACEKEY": "place-2", "LOCATION_NAME": "name\n" * 5000},
+        {"PLACEKEY": "place-3", "LOCATION_NAME": "name\n" * 300000},
+    ]
+    write_places_file(file_name, rows)
+    assert len(read_rows(file_name, reader_type)) == 3
+    with pytest.raises(ValueError, match="--max_field_size"):
+        read_rows(file_name, reader_type, max_field_size=10000)
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("reader_type", reader_types)
+def test_unbalanced_quote_in_unmapped_field(tmp_path, write_places_file, reader_type):
+    # --the open quote takes in the rest of the file as one POLYGON_WKT field
+    file_name = str(tmp_path / "places.csv")
+    rows = [{"PLACEKEY": "place-%s" % x} for x in range(20000)]
+    header = write_places_file(file_name, rows)
+    with open(file_name, "a", encoding="utf-8") as outfile:
+        outfile.write(",".join('"open' if x == "POLYGON_WKT" else "value" for x in header) + "\n")
+        outfile.write("more,values\n" * 200000)
+    rows = read_rows(file_name, reader_type, max_field_size=10000)
+    assert len(rows) == 20001
+    assert rows == read_rows(file_name, "csv")
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("reader_type", reader_types)
+def test_field_size_is_measured_unquoted(tmp_path, write_places_file, reader_type):
+    file_name = str(tmp_path / "places.csv")
+    location_name = 'a "quoted", name' + "x" * 184
+    write_places_file(file_name, [{"LOCATION_NAME": location_name}])
+    assert len(read_rows(file_name, reader_type, max_field_size=200)) == 1
+    with pytest.raises(ValueError, match="--max_field_size"):
+        read_rows(file_name, reader_type, max_field_size=199)
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("reader_type", ["projected", "mmap"])
+def test_readers_match_the_csv_reader(tmp_path, write_mixed_file, reader_type):
+    file_name = str(tmp_path / "places.csv")
+    write_mixed_file(file_name)
+    expected_rows = read_rows(file_name, "csv")
+    assert len(expected_rows) == 3003
+    assert read_rows(file_name, reader_type) == expected_rows
+    assert read_offsets(file_name, reader_type) == read_offsets(file_name, "csv")
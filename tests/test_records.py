@@ -0,0 +1,131 @@
+import copy
+import json
+
+from safegraph_mapper.mapping import build_record, map_batch, mapper
+
+rows = [
+    {
+        "PLACEKEY": "222-222@5qw-shj-7qz",
+        "PARENT_PLACEKEY": "zzw-222@5qw-shj-7qz",
+        "LOCATION_NAME": "  Corner   Coffee ",
+        "BRANDS": "   ",
+        "TOP_CATEGORY": "Restaurants and Other Eating Places",
+        "SUB_CATEGORY": "Snack and Nonalcoholic Beverage Bars",
+        "NAICS_CODE": "722515",
+        "LATITUDE": "40.748817",
+        "LONGITUDE": "-73.985428",
+        "CATEGORY_TAGS": "Coffee,Tea",
+        "OPENED_ON": "2019-07",
+        "CLOSED_ON": "",
+        "TRACKING_CLOSED_SINCE": "2019-07-01",
+        "PHONE_NUMBER": "+12125551234",
+        "ISO_COUNTRY_CODE": "US",
+        "FULL_ADDRESS": "350 5th Ave, New York, NY 10118",
+        "IS_INTERSECTION": "false",
+        "MAILING_VERIFIED_STATUS": "null",
+    },
+    {
+        "PLACEKEY": "223-222@5qw-shj-7qz",
+        "PARENT_PLACEKEY": "223-222@5qw-shj-7qz",
+        "LOCATION_NAME": "Corner Books",
+        "TOP_CATEGORY": "Book Stores and News Dealers",
+        "NAICS_CODE": "451211",
+        "CLOSED_ON": "2021-01",
+        "ISO_COUNTRY_CODE": "US",
+        "IS_INTERSECTION": "true",
+        "MAILING_VERIFIED_STATUS": "VERIFIED_PREMISE",
+    },
+]
+
+# --the records the mapper wrote for these rows before build_record(), attributes in
+# --the same order
+baseline_records = [
+    [
+        ("DATA_SOURCE", "SAFEGRAPH"),
+        ("RECORD_ID", "222-222@5qw-shj-7qz"),
+        ("RECORD_TYPE", "ORGANIZATION"),
+        ("PLACEKEY", "222-222@5qw-shj-7qz"),
+        ("REL_ANCHOR_DOMAIN", "PLACEKEY"),
+        ("REL_ANCHOR_KEY", "222-222@5qw-shj-7qz"),
+        ("REL_POINTER_DOMAIN", "PLACEKEY"),
+        ("REL_POINTER_KEY", "zzw-222@5qw-shj-7qz"),
+        ("REL_POINTER_ROLE", "PARENT"),
+        ("LOCATION_NAME_ORG", "Corner Coffee"),
+        ("TOP_CATEGORY", "Restaurants and Other Eating Places"),
+        ("SUB_CATEGORY", "Snack and Nonalcoholic Beverage Bars"),
+        ("NAICS_CODE", "722515"),
+        ("BUSINESS_GEO_LATITUDE", "40.748817"),
+        ("BUSINESS_GEO_LONGITUDE", "-73.985428"),
+        ("CATEGORY_TAGS", "Coffee,Tea"),
+        ("OPENED_ON", "2019-07"),
+        ("TRACKING_CLOSED_SINCE", "2019-07-01"),
+        ("PHONE_NUMBER", "+12125551234"),
+        ("BUSINESS_ADDR_COUNTRY", "US"),
+        ("BUSINESS_ADDR_FULL", "350 5th Ave, New York, NY 10118"),
+    ],
+    [
+        ("DATA_SOURCE", "SAFEGRAPH"),
+        ("RECORD_ID", "223-222@5qw-shj-7qz"),
+        ("RECORD_TYPE", "ORGANIZATION"),
+        ("PLACEKEY", "223-222@5qw-shj-7qz"),
+        ("REL_ANCHOR_DOMAIN", "PLACEKEY"),
+        ("REL_ANCHOR_KEY", "223-222@5qw-shj-7qz"),
+        ("LOCATION_NAME_ORG", "Corner Books"),
+        ("TOP_CATEGORY", "Book Stores and News Dealers"),
+        ("NAICS_CODE", "451211"),
+        ("CLOSED_ON", "2021-01"),
+        ("BUSINESS_ADDR_COUNTRY", "US"),
+        ("MAILING_VERIFIED_STATUS", "VERIFIED_PREMISE"),
+    ],
+]
+
+
+# ----------------------------------------
+def remove_empty_tags(d):
+    # --what map() used to run over the whole record instead of build_record()
+    if isinstance(d, dict):
+        for k, v in list(d.items()):
+            if v is None or len(str(v).strip()) == 0:
+                del d[k]
+            else:
+                remove_empty_tags(v)
+    if isinstance(d, list):
+        for v in d:
+            remove_empty_tags(v)
+    return d
+
+
+# ----------------------------------------
+def test_rows_map_to_the_baseline_records():
+    json_lines = map_batch(rows, mapper(), serializer="json")
+    assert [list(json.loads(x).items()) for x in json_lines] == baseline_records
+
+
+# ----------------------------------------
+def test_build_record_drops_what_remove_empty_tags_did():
+    json_data = {
+        "DATA_SOURCE": "SAFEGRAPH",
+        "EMPTY": "",
+        "SPACES": " \t\n",
+        "NONE": None,
+        "ZERO": 0,
+        "FLOAT": 0.0,
+        "FALSE": False,
+        "NAME": " keep the spaces ",
+        "EMPTY_DICT": {},
+        "LIST": [{"A": "1", "B": ""}, {"C": None, "D": "4"}],
+    }
+    record = build_record(json_data)
+    assert list(record.items()) == list(remove_empty_tags(copy.deepcopy(json_data)).items())
+
+
+# ----------------------------------------
+def test_build_record_leaves_out_empty_features():
+    # --remove_empty_tags() kept a feature with nothing left in it, build_record() drops
+    # --it and the whole list when none are left
+    json_data = {
+        "ADDRESSES": [{"ADDR_LINE1": "1 Main St"}, {"ADDR_LINE1": " "}],
+        "PHONES": [{"PHONE": None}],
+        "EMAILS": [],
+    }
+    assert build_record(json_data) == {"ADDRESSES": [{"ADDR_LINE1": "1 Main St"}]}
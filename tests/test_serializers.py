@@ -0,0 +1,46 @@
+import pytest
+
+from safegraph_mapper.mapping import map_batch, mapper
+from safegraph_mapper.serializers import json_dumps_line, orjson_dumps_line, serializers_match
+
+pytest.importorskip("orjson")
+
+rows = [
+    {
+        "PLACEKEY": "222-222@5qw-shj-7qz",
+        "LOCATION_NAME": 'Café "Zoë"\tand\\   \U0001f600',
+        "TOP_CATEGORY": "Restaurants and Other Eating Places",
+        "LATITUDE": "40.748817",
+        "LONGITUDE": "-73.985428",
+        "PHONE_NUMBER": "+12125551234",
+        "ISO_COUNTRY_CODE": "US",
+        "FULL_ADDRESS": "350 5th Ave\nNew York, NY 10118",
+    },
+    {
+        "PLACEKEY": "223-222@5qw-shj-7qz",
+        "LOCATION_NAME": "控制\x01字符\x1f",
+        "OPENED_ON": "2019-07",
+        "ISO_COUNTRY_CODE": "JP",
+    },
+]
+
+
+# ----------------------------------------
+def test_serializers_write_the_same_lines():
+    json_lines = map_batch(rows, mapper(), serializer="json")
+    assert len(json_lines) == 2
+    assert map_batch(rows, mapper(), serializer="orjson") == json_lines
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "json_data",
+    [
+        {"NAME": "\x00\x7f ퟿\U0010ffff", "LIST": [{"A": ""}, []]},
+        {"FLOAT": 0.1, "INT": -(2**63), "NONE": None, "BOOL": True},
+        {"Z": 1, "A": {"Y": 2, "B": 3}},
+    ],
+)
+def test_serializers_match(json_data):
+    assert serializers_match(json_data)
+    assert orjson_dumps_line(json_data) == json_dumps_line(json_data)
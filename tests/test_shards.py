@@ -0,0 +1,57 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "output_name, options",
+    [
+        ("output.json", []),
+        ("output.json", ["--workers", "2"]),
+        ("output.json.gz", ["--workers", "2"]),
+        ("output.json", ["--sort_output", "placekey"]),
+    ],
+    ids=["one-worker", "workers", "gzip", "sorted"],
+)
+def test_shard_manifests_match_the_shards(tmp_path, write_places_file, output_name, options):
+    input_file = str(tmp_path / "places.csv")
+    write_places_file(input_file, [{"PLACEKEY": "place-%s@5qw-%s" % (x, x % 31)} for x in range(5000)])
+    output_file = str(tmp_path / output_name)
+    subprocess.run(
+        [sys.executable, script_file, "-i", input_file, "-o", output_file, "--shard_count", "3"] + options,
+        check=True,
+        capture_output=True,
+    )
+
+    # --the manifests are not picked up along with the shards
+    shard_files = sorted(glob.glob(str(tmp_path / ("output-shard-*%s" % output_name[6:]))))
+    assert [os.path.basename(x) for x in shard_files] == [
+        "output-shard-%03d%s" % (x, output_name[6:]) for x in (1, 2, 3)
+    ]
+    record_ids = []
+    for shard_file in shard_files:
+        with open(shard_file + ".manifest", "r", encoding="utf-8") as infile:
+            manifest = json.load(infile)
+        with open(shard_file, "rb") as infile:
+            shard_bytes = infile.read()
+        if output_name.endswith(".gz"):
+            shard_lines = gzip.decompress(shard_bytes).splitlines()
+        else:
+            shard_lines = shard_bytes.splitlines()
+        assert manifest == {
+            "file": os.path.basename(shard_file),
+            "rows": len(shard_lines),
+            "bytes": len(shard_bytes),
+            "sha256": hashlib.sha256(shard_bytes).hexdigest(),
+        }
+        record_ids += [json.loads(x)["RECORD_ID"] for x in shard_lines]
+    assert sorted(record_ids) == sorted("place-%s@5qw-%s" % (x, x % 31) for x in range(5000))
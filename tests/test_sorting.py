@@ -0,0 +1,58 @@
+import argparse
+import random
+
+import pytest
+
+from safegraph_mapper import sorting
+from safegraph_mapper.mapping import map_batch, mapper
+from safegraph_mapper.sorting import get_sort_key, sort_output_files
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("sort_output", ["placekey", "geohash"])
+def test_sort_merges_several_runs(tmp_path, monkeypatch, sort_output):
+    # --about 4 MB of records sorted 1 MB at a time, merged 2 runs at a time
+    row_random = random.Random(sort_output)
+    rows = [
+        {
+            "PLACEKEY": "%s@%s-%s-%s" % (row_num, row_random.choice("5qw9vk"), row_random.randint(0, 9), "7qz"),
+            "LOCATION_NAME": "place %s %s" % (row_num, "x" * 500),
+            "LATITUDE": "%.4f" % row_random.uniform(-80, 80),
+            "LONGITUDE": "%.4f" % row_random.uniform(-170, 170),
+        }
+        for row_num in range(6000)
+    ]
+    json_lines = map_batch(rows, mapper(), serializer="json")
+    mapped_files = []
+    for file_num in range(2):
+        mapped_files.append(str(tmp_path / ("mapped-%s.json" % file_num)))
+        with open(mapped_files[-1], "wb") as outfile:
+            outfile.writelines(json_lines[file_num * 3000 : (file_num + 1) * 3000])
+
+    run_files = []
+
+    def write_sort_run(run_file, entries):
+        run_files.append(run_file)
+        return sort_run_writer(run_file, entries)
+
+    sort_run_writer = sorting.write_sort_run
+    monkeypatch.setattr(sorting, "write_sort_run", write_sort_run)
+    args = argparse.Namespace(sort_output=sort_output, sort_memory=1, geohash_precision=3)
+    output_files = [str(tmp_path / ("output-%s.json" % x)) for x in range(3)]
+    output_rows = sort_output_files(mapped_files, output_files, args, str(tmp_path), merge_width=2)
+    assert len(run_files) > 3
+    assert sum(output_rows) == 6000
+
+    # --a stable sort, the shards are consecutive and no sort key is split between two
+    expected_lines = sorted(json_lines, key=lambda x: get_sort_key(x, sort_output, 3))
+    output_lines = []
+    shard_keys = []
+    for output_file, row_count in zip(output_files, output_rows):
+        with open(output_file, "rb") as infile:
+            shard_lines = infile.readlines()
+        assert len(shard_lines) == row_count
+        output_lines += shard_lines
+        shard_keys.append({get_sort_key(x, sort_output, 3) for x in shard_lines})
+    assert output_lines == expected_lines
+    assert all(not shard_keys[x] & shard_keys[x + 1] for x in range(2))
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["output-0.json", "output-1.json", "output-2.json"]
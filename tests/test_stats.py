@@ -0,0 +1,74 @@
+import random
+
+from safegraph_mapper.mapping import mapper
+
+
+# ----------------------------------------
+def get_mean_example_index(capture, trial_count=20, value_count=20000):
+    # --the values are numbered in the order they are seen, an unbiased sample keeps
+    # --examples from anywhere in the run so their mean index is near the middle
+    random.seed(1)
+    example_indexes = []
+    for _ in range(trial_count):
+        sg_mapper = mapper("sampled")
+        for value_num in range(value_count):
+            capture(sg_mapper, "value %s" % value_num)
+        examples = sg_mapper.stat_pack["TEST"]["ATTRIBUTE"]["examples"]
+        assert len(examples) == sg_mapper.stat_example_count
+        example_indexes.extend(int(x.split()[1]) for x in examples)
+    return sum(example_indexes) / len(example_indexes)
+
+
+# ----------------------------------------
+def test_mapped_stats_sample_is_unbiased():
+    mean_index = get_mean_example_index(
+        lambda sg_mapper, value: sg_mapper.capture_mapped_stats({"DATA_SOURCE": "TEST", "ATTRIBUTE": value}),
+    )
+    assert 8500 < mean_index < 11500
+
+
+# ----------------------------------------
+def test_update_stat_sample_is_unbiased():
+    mean_index = get_mean_example_index(lambda sg_mapper, value: sg_mapper.update_stat("TEST", "ATTRIBUTE", value))
+    assert 8500 < mean_index < 11500
+
+
+# ----------------------------------------
+def test_counts_mode_keeps_no_examples():
+    sg_mapper = mapper("counts")
+    for value_num in range(100):
+        sg_mapper.capture_mapped_stats({"DATA_SOURCE": "TEST", "ATTRIBUTE": value_num})
+    assert sg_mapper.stat_pack["TEST"]["ATTRIBUTE"] == {"count": 100}
+
+
+# ----------------------------------------
+def get_merged_share(value_counts, trial_count=200):
+    # --the share of the merged examples from each worker, merged in worker order
+    random.seed(1)
+    example_counts = [0] * len(value_counts)
+    for _ in range(trial_count):
+        stat_mapper = mapper("sampled")
+        for worker_num, value_count in enumerate(value_counts):
+            worker_mapper = mapper("sampled")
+            for value_num in range(value_count):
+                worker_mapper.update_stat("TEST", "ATTRIBUTE", "worker %s value %s" % (worker_num, value_num))
+            stat_mapper.merge_stat_pack(worker_mapper.stat_pack)
+        examples = stat_mapper.stat_pack["TEST"]["ATTRIBUTE"]["examples"]
+        assert len(examples) == stat_mapper.stat_example_count
+        assert stat_mapper.stat_pack["TEST"]["ATTRIBUTE"]["count"] == sum(value_counts)
+        for example in examples:
+            example_counts[int(example.split()[1])] += 1
+    return [x / sum(example_counts) for x in example_counts]
+
+
+# ----------------------------------------
+def test_merged_sample_is_weighted_by_count():
+    # --a small first worker only gets its share of the examples
+    small_share, large_share = get_merged_share([10, 2000])
+    assert small_share < 0.03 < 0.97 < large_share
+
+
+# ----------------------------------------
+def test_merged_sample_is_even_across_workers():
+    for worker_share in get_merged_share([500, 500, 500, 500]):
+        assert 0.2 < worker_share < 0.3
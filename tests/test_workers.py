@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+script_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "safegraph-mapper.py")
+
+
+# ----------------------------------------
+def map_file(input_file, output_file, *options):
+    subprocess.run(
+        [sys.executable, script_file, "-i", input_file, "-o", output_file, *options],
+        check=True,
+        capture_output=True,
+    )
+    with open(output_file, "rb") as infile:
+        return infile.read()
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("reader_type", ["csv", "projected", "mmap"])
+def test_workers_match_one_worker(tmp_path, write_mixed_file, reader_type):
+    # --the file splits land inside quoted line breaks as well as between records
+    input_file = str(tmp_path / "places.csv")
+    write_mixed_file(input_file)
+    expected_output = map_file(input_file, str(tmp_path / "output-1.json"))
+    assert expected_output.count(b"\n") > 3000
+    for worker_count in [2, 7]:
+        assert (
+            map_file(
+                input_file,
+                str(tmp_path / ("output-%s.json" % worker_count)),
+                "--reader",
+                reader_type,
+                "--workers",
+                str(worker_count),
+            )
+            == expected_output
+        )